@@ -0,0 +1,103 @@
+import hashlib
+import json
+from datetime import datetime
+from flask import Blueprint, Response, request, abort, stream_with_context
+from models import Venue, Artist, Show
+from routing import read_only
+from writebehind import show_writer
+from queries import iter_venues, iter_artists, iter_shows, collection_version, venue_detail, artist_detail
+
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#
+# Collections stream as NDJSON, one object per line, straight from a
+# server-side cursor, and carry an ETag built from a cheap version query so
+# unchanged collections answer If-None-Match with 304 before any row is read.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def json_default(value):
+  if isinstance(value, datetime):
+    return value.isoformat()
+  raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def to_json(value):
+  return json.dumps(value, default=json_default)
+
+
+def json_response(data, status=200):
+  return Response(to_json(data), status=status, mimetype='application/json')
+
+
+def ndjson_response(model, rows):
+  # rows is called only when the client's copy is stale
+  etag = hashlib.sha1(f"{model.__tablename__}:{collection_version(model)}".encode()).hexdigest()
+  if request.if_none_match.contains(etag):
+    response = Response(status=304)
+  else:
+    def generate():
+      for row in rows():
+        yield to_json(row._asdict()) + "\n"
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+  response.set_etag(etag)
+  return response
+
+
+@api.errorhandler(404)
+def not_found_error(error):
+  return json_response({"error": "not found"}, 404)
+
+
+#  Collections
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+@read_only
+def venues():
+  return ndjson_response(Venue, iter_venues)
+
+@api.route('/artists')
+@read_only
+def artists():
+  return ndjson_response(Artist, iter_artists)
+
+@api.route('/shows')
+@read_only
+def shows():
+  return ndjson_response(Show, iter_shows)
+
+
+#  Details
+#  ----------------------------------------------------------------
+
+@api.route('/venues/<int:venue_id>')
+@read_only
+def venue(venue_id):
+  venue_data = venue_detail(venue_id)
+  if venue_data is None:
+    abort(404)
+  return json_response(venue_data)
+
+@api.route('/artists/<int:artist_id>')
+@read_only
+def artist(artist_id):
+  artist_data = artist_detail(artist_id)
+  if artist_data is None:
+    abort(404)
+  return json_response(artist_data)
+
+
+#  Show jobs
+#  ----------------------------------------------------------------
+
+@api.route('/shows/jobs/<job_id>')
+def show_job(job_id):
+  # the state of a show submitted with SHOW_WRITES = 'background' (see writebehind.py)
+  state = show_writer.state(job_id)
+  if state is None:
+    abort(404)
+  return json_response({"id": job_id, "state": state})
@@ -0,0 +1,127 @@
+import sys
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort
+from models import db, Artist
+from queries import artist_list, artist_detail
+from search import search
+from cache import response_cache, conditional, touch_counterparts, artist_key, artist_page_keys
+from routing import read_only
+from streaming import stream_template
+
+# forms are imported by the write handlers, see venues.py
+
+artist_pages = Blueprint('artists', __name__)
+
+
+#  Artists
+#  ----------------------------------------------------------------
+@artist_pages.route('/artists')
+@read_only
+@response_cache.cached(lambda: 'artists' if not request.args else None)
+def artists():
+  # TODO: --done replace with real data returned from querying the database
+  genre = request.args.get('genre')
+  artists = artist_list(genre=genre)
+  return stream_template('pages/artists.html', artists=artists, genre=genre)
+
+@artist_pages.route('/artists/search', methods=['POST'])
+def search_artists():
+  # TODO: --done implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+  # search for "band" should return "The Wild Sax Band".
+
+  search_query = request.form.get('search_term', '')
+  # ranked, limited matches with their upcoming show counts, in one query
+  search_results = search.artists(search_query)
+  return render_template('pages/search_artists.html', results=search_results, search_term=search_query)
+
+#  Artists Show
+#  ----------------------------------------------------------------
+@artist_pages.route('/artists/<int:artist_id>')
+@read_only
+@conditional(Artist)
+@response_cache.cached(artist_key)
+def show_artist(artist_id):
+  # shows the artist page with the given artist_id
+  artist_data = artist_detail(artist_id)
+  if artist_data is None:
+    abort(404)
+
+  return render_template('pages/show_artist.html', artist=artist_data)
+
+
+#  Update
+#  ----------------------------------------------------------------
+@artist_pages.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  from forms import ArtistForm
+  # TODO: --done populate form with fields from artist with ID <artist_id>
+  form = ArtistForm()
+  artist = Artist.query.get(artist_id)
+  form.genres.data = artist.genres
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@artist_pages.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  from forms import ArtistForm, artist_columns
+  # TODO: --done take values from the form submitted, and update existing
+  # artist record with ID <artist_id> using the new attributes
+  artist_form = ArtistForm(request.form)
+
+  if artist_form.validate():
+    try:
+      artist_to_update = Artist.query.get(artist_id)
+
+      for column, value in artist_columns(artist_form).items():
+        setattr(artist_to_update, column, value)
+
+      db.session.add(artist_to_update)
+      touch_counterparts(artist_to_update)
+      db.session.commit()
+      response_cache.invalidate(*artist_page_keys(artist_id))
+      flash("Artist " + artist_to_update.name + " was successfully edited!")
+    except:
+      db.session.rollback()
+      print(sys.exc_info())
+      flash("Artist was not edited successfully.")
+  else:
+    print("\n\n", artist_form.errors)
+    flash("Artist was not edited successfully.")
+
+  return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@artist_pages.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@artist_pages.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  from forms import ArtistForm, artist_columns
+  # called upon submitting the new artist listing form
+  # TODO: --done insert form data as a new Venue record in the db, instead
+  # TODO: --done modify data to be the data object returned from db insertion
+  # on successful db insert, flash success
+  #flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  # TODO: --done on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+
+  artist_form = ArtistForm(request.form)
+  if artist_form.validate():
+    try:
+      new_artist_record = Artist(**artist_columns(artist_form))
+      db.session.add(new_artist_record)
+      db.session.commit()
+      response_cache.invalidate('artists', 'index')
+      flash("Artist " + request.form["name"] + " was successfully listed!")
+    except Exception:
+      db.session.rollback()
+      flash("Artist was not successfully listed.")
+  else:
+    print(artist_form.errors)
+    flash("Artist was not successfully listed.")
+
+  return redirect(url_for("index"))
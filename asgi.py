@@ -0,0 +1,274 @@
+import asyncio
+import io
+import itertools
+import re
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from flask import render_template
+from sqlalchemy.dialects import postgresql
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+from app import create_app
+from models import db, Venue, Artist
+from queries import DETAIL_SHOWS_LIMIT, recently_listed, venue_shows, artist_shows, split_shows_query, split_rows, venue_fields, artist_fields
+from api import json_response
+from routing import read_bind
+
+try:
+  import asyncpg
+except ImportError:
+  raise RuntimeError("the async serving mode requires the asyncpg package (pip install asyncpg uvicorn)")
+
+
+#----------------------------------------------------------------------------#
+# Async serving mode.
+#
+# `uvicorn asgi:application` serves the hottest read endpoints from asyncio
+# on an asyncpg pool, running their independent statements concurrently;
+# every other request goes to the regular Flask app on a thread pool, so
+# the two modes share routes, templates, sessions and replica routing.
+#
+# The statements are the SQLAlchemy queries from queries.py, compiled to
+# SQL once per process (SQLAlchemy 1.3 has no async engine). Pages served
+# this way bypass the page cache and the per-request instrumentation.
+#
+# Only /, /api/v1/venues/<id> and /api/v1/artists/<id> are served here. The
+# other read pages stay on the Flask app: they answer from the page cache
+# and conditional ETags (cache.py) or stream their templates from a
+# server-side cursor (streaming.py), none of which has an async path yet.
+# `flask bench modes` compares the two modes (see bench.py).
+#----------------------------------------------------------------------------#
+
+# compiles with %s placeholders, which are then renumbered to asyncpg's $1, $2...
+DIALECT = postgresql.dialect(paramstyle='format')
+PLACEHOLDER = re.compile(r'%(s|%)')
+
+
+class Prepared:
+  # an ORM query compiled once for asyncpg; values for its named bindparams
+  # are passed on each execution, its other parameters keep their values
+
+  def __init__(self, query):
+    statement = query.statement
+    compiled = statement.compile(dialect=DIALECT)
+    numbers = itertools.count(1)
+    self.sql = PLACEHOLDER.sub(lambda match: f"${next(numbers)}" if match.group(1) == 's' else '%', compiled.string)
+    self.names = compiled.positiontup
+    self.defaults = compiled.params
+    # rows are named tuples, so they read like SQLAlchemy rows: named after the
+    # projected columns, or the table's columns for a query of whole entities
+    fields = [description['name'] for description in query.column_descriptions]
+    columns = statement.c.keys()
+    self.row = namedtuple('Row', fields if len(fields) == len(columns) else columns)
+
+  def parameters(self, values):
+    return [values[name] if name in values else self.defaults[name] for name in self.names]
+
+
+# name -> the query it prepares; built inside an app context on first use
+QUERIES = {
+  'recent_venues': lambda: recently_listed(Venue),
+  'recent_artists': lambda: recently_listed(Artist),
+  'venue': lambda: Venue.query.filter(Venue.id == db.bindparam('entity_id')),
+  'artist': lambda: Artist.query.filter(Artist.id == db.bindparam('entity_id')),
+  'venue_shows': lambda: split_shows_query(venue_shows(db.bindparam('entity_id')), db.bindparam('now'), db.bindparam('limit')),
+  'artist_shows': lambda: split_shows_query(artist_shows(db.bindparam('entity_id')), db.bindparam('now'), db.bindparam('limit')),
+}
+
+@lru_cache(maxsize=None)
+def prepared(name):
+  return Prepared(QUERIES[name]())
+
+
+def wsgi_environ(scope, body=b''):
+  # the WSGI environ of an ASGI HTTP request
+  server = scope.get('server') or ('localhost', 80)
+  environ = {
+    'REQUEST_METHOD': scope['method'],
+    'SCRIPT_NAME': scope.get('root_path', ''),
+    'PATH_INFO': scope['path'],
+    'QUERY_STRING': scope['query_string'].decode('latin-1'),
+    'SERVER_NAME': server[0],
+    'SERVER_PORT': str(server[1]),
+    'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+    'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+    'CONTENT_LENGTH': str(len(body)),
+    'wsgi.version': (1, 0),
+    'wsgi.url_scheme': scope.get('scheme', 'http'),
+    'wsgi.input': io.BytesIO(body),
+    'wsgi.errors': sys.stderr,
+    'wsgi.multithread': True,
+    'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+  }
+  for name, value in scope['headers']:
+    name, value = name.decode('latin-1').upper().replace('-', '_'), value.decode('latin-1')
+    key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+    environ[key] = f"{environ[key]},{value}" if key.startswith('HTTP_') and key in environ else value
+  return environ
+
+
+def response_start(status, headers):
+  return {
+    'type': 'http.response.start',
+    'status': int(status.split(' ', 1)[0]),
+    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+  }
+
+
+class AsyncDatabase:
+  # one asyncpg pool per bind (None is the primary), created on first use
+
+  def __init__(self, app):
+    self.app = app
+    self.pools = {}
+
+  def url(self, bind):
+    url = self.app.config['SQLALCHEMY_BINDS'][bind] if bind else self.app.config['SQLALCHEMY_DATABASE_URI']
+    # asyncpg takes libpq URLs, without SQLAlchemy's +driver suffix
+    return re.sub(r'^postgres(ql)?(\+\w+)?://', 'postgresql://', url)
+
+  async def pool(self, bind):
+    if bind not in self.pools:
+      config = self.app.config
+      settings = {}
+      if config.get('DB_STATEMENT_TIMEOUT'):
+        settings['statement_timeout'] = str(config['DB_STATEMENT_TIMEOUT'])
+      # concurrent first requests all wait on the same pool
+      self.pools[bind] = asyncio.ensure_future(asyncpg.create_pool(
+        self.url(bind),
+        min_size=1,
+        max_size=config.get('DB_POOL_SIZE', 5) + config.get('DB_MAX_OVERFLOW', 10),
+        server_settings=settings,
+      ))
+    return await self.pools[bind]
+
+  async def fetch(self, bind, query, values):
+    pool = await self.pool(bind)
+    return [query.row(*record.values()) for record in await pool.fetch(query.sql, *query.parameters(values))]
+
+  async def fetch_all(self, bind, queries, **values):
+    # runs independent prepared queries concurrently, each on its own connection
+    return await asyncio.gather(*(self.fetch(bind, query, values) for query in queries))
+
+  async def close(self):
+    pools, self.pools = self.pools, {}
+    for pool in pools.values():
+      await (await pool).close()
+
+
+class AsyncApp:
+
+  def __init__(self, app):
+    self.app = app
+    self.db = AsyncDatabase(app)
+    # threads running the Flask app for everything not served here
+    self.executor = ThreadPoolExecutor(max_workers=app.config.get('ASYNC_WSGI_THREADS', 16))
+    self.urls = Map([
+      Rule('/', endpoint='index', methods=['GET']),
+      Rule('/api/v1/venues/<int:entity_id>', endpoint='venue', methods=['GET']),
+      Rule('/api/v1/artists/<int:entity_id>', endpoint='artist', methods=['GET']),
+    ])
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      return await self.lifespan(receive, send)
+    try:
+      endpoint, arguments = self.urls.bind('localhost').match(scope['path'], method=scope['method'])
+    except HTTPException:
+      return await self.wsgi(scope, receive, send)
+    environ = wsgi_environ(scope)
+    response = await getattr(self, endpoint)(environ, **arguments)
+    for message in [response_start(response.status, response.headers.items()),
+                    {'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else response.get_data()}]:
+      await send(message)
+
+  async def lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        await self.db.close()
+        self.executor.shutdown(wait=False)
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+  #  Async endpoints
+  #  ----------------------------------------------------------------
+  #  The request context is only held while no statement is pending: Flask's
+  #  context locals are per thread, not per task. Responses go through the
+  #  Flask app's after_request hooks and session saving in the context that
+  #  rendered them, so consumed flash messages stay consumed.
+
+  async def index(self, environ):
+    with self.app.request_context(environ):
+      bind = read_bind()
+      queries = [prepared('recent_venues'), prepared('recent_artists')]
+    venues, artists = await self.db.fetch_all(bind, queries)
+    with self.app.request_context(environ):
+      return self.app.process_response(self.app.make_response(
+        render_template('pages/home.html', venues=venues, artists=artists)))
+
+  async def venue(self, environ, entity_id):
+    return await self.detail(environ, 'venue', entity_id, venue_fields)
+
+  async def artist(self, environ, entity_id):
+    return await self.detail(environ, 'artist', entity_id, artist_fields)
+
+  async def detail(self, environ, name, entity_id, fields):
+    # the entity and its shows are fetched side by side
+    now = datetime.utcnow()
+    with self.app.request_context(environ):
+      bind = read_bind()
+      queries = [prepared(name), prepared(f'{name}_shows')]
+    entities, show_rows = await self.db.fetch_all(bind, queries, entity_id=entity_id, now=now, limit=DETAIL_SHOWS_LIMIT)
+    with self.app.request_context(environ):
+      if not entities:
+        return self.app.process_response(json_response({"error": "not found"}, 404))
+      return self.app.process_response(json_response(fields(entities[0], *split_rows(show_rows, now))))
+
+  #  Everything else
+  #  ----------------------------------------------------------------
+
+  async def wsgi(self, scope, receive, send):
+    body = b''
+    while True:
+      message = await receive()
+      body += message.get('body', b'')
+      if not message.get('more_body'):
+        break
+    environ = wsgi_environ(scope, body)
+    loop = asyncio.get_running_loop()
+
+    def run():
+      # iterates the whole response on one thread, since streamed responses
+      # keep their request context pushed while they are read
+      def emit(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+      started = []
+      def start_response(status, headers, exc_info=None):
+        started[:] = [status, headers]
+      chunks = self.app(environ, start_response)
+      try:
+        sent_start = False
+        for chunk in chunks:
+          if not sent_start:
+            emit(response_start(*started))
+            sent_start = True
+          if chunk:
+            emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not sent_start:
+          emit(response_start(*started))
+        emit({'type': 'http.response.body', 'body': b''})
+      finally:
+        if hasattr(chunks, 'close'):
+          chunks.close()
+
+    await loop.run_in_executor(self.executor, run)
+
+
+application = AsyncApp(create_app())
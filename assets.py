@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import gzip
+import hashlib
+import click
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#
+# `flask assets build` concatenates each bundle below, minifies it and writes
+# it to static/dist under a name carrying a hash of its content, next to a
+# .gz (and, with the optional `brotli` package, a .br) copy and manifest.json.
+# Templates ask for a bundle with asset_urls(); with ASSETS_BUNDLED on and a
+# manifest built, that is the one hashed file, served precompressed and
+# cached for a year. Otherwise it is the source files, as before.
+#----------------------------------------------------------------------------#
+
+STATIC_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = os.path.join(DIST_DIR, 'manifest.json')
+
+# bundle name: source files under static/, in load order
+BUNDLES = {
+  'main.css': [
+    'css/bootstrap.min.css',
+    'css/layout.main.css',
+    'css/main.css',
+    'css/main.responsive.css',
+    'css/main.quickfix.css',
+  ],
+  # loaded in <head>, before the page renders
+  'head.js': [
+    'js/libs/modernizr-2.8.2.min.js',
+    'js/libs/moment.min.js',
+  ],
+  # deferred, after jQuery
+  'main.js': [
+    'js/script.js',
+    'js/libs/bootstrap-3.1.1.min.js',
+    'js/plugins.js',
+  ],
+  # old IE only
+  'respond.js': [
+    'js/libs/respond-1.4.2.min.js',
+  ],
+}
+
+# a hashed file never changes, so browsers and proxies may keep it for good
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# (suffix, Accept-Encoding token) in order of preference
+ENCODINGS = [('.br', 'br'), ('.gz', 'gzip')]
+
+
+#  Build
+#  ----------------------------------------------------------------
+
+def minify_css(source):
+  # comments and the whitespace around punctuation; strings and url()s in the
+  # sources don't contain either. A space before ':' can be a descendant
+  # combinator ("a :hover"), so only the one after it goes.
+  source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+  source = re.sub(r'\s+', ' ', source)
+  source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+  source = re.sub(r':\s+', ':', source)
+  return source.replace(';}', '}').strip()
+
+def minify_js(source):
+  # rjsmin when it is installed; libraries already ship minified
+  try:
+    import rjsmin
+  except ImportError:
+    return source
+  return rjsmin.jsmin(source)
+
+def bundle_source(name):
+  parts = []
+  for path in BUNDLES[name]:
+    with open(os.path.join(STATIC_DIR, path), encoding='utf-8') as source:
+      text = source.read()
+    if not path.endswith('.min.js') and not path.endswith('.min.css'):
+      text = minify_css(text) if name.endswith('.css') else minify_js(text)
+    parts.append(text)
+  # a newline and, for scripts, a semicolon keep one file's last statement from running into the next
+  return (';\n' if name.endswith('.js') else '\n').join(parts) + '\n'
+
+def compressed(data):
+  # (suffix, bytes) for every encoding available here
+  variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+  try:
+    import brotli
+  except ImportError:
+    return variants
+  return variants + [('.br', brotli.compress(data, quality=11))]
+
+def build(out_dir=DIST_DIR):
+  # writes the bundles and their manifest, returns {bundle name: file name}
+  os.makedirs(out_dir, exist_ok=True)
+  manifest = {}
+  for name in BUNDLES:
+    data = bundle_source(name).encode('utf-8')
+    stem, extension = os.path.splitext(name)
+    file_name = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}'
+    with open(os.path.join(out_dir, file_name), 'wb') as output:
+      output.write(data)
+    for suffix, variant in compressed(data):
+      with open(os.path.join(out_dir, file_name + suffix), 'wb') as output:
+        output.write(variant)
+    manifest[name] = file_name
+  with open(os.path.join(out_dir, 'manifest.json'), 'w') as output:
+    json.dump(manifest, output, indent=2, sort_keys=True)
+  return manifest
+
+def clean(manifest, out_dir=DIST_DIR):
+  # removes the hashed files of earlier builds
+  keep = {'manifest.json'} | {name + suffix for name in manifest.values() for suffix in ('', '.gz', '.br')}
+  removed = [name for name in os.listdir(out_dir) if name not in keep]
+  for name in removed:
+    os.remove(os.path.join(out_dir, name))
+  return removed
+
+
+assets_cli = AppGroup('assets', help='Build the static asset bundles.')
+
+@assets_cli.command('build')
+@click.option('--clean', 'remove_old', is_flag=True, help='Delete bundles left over from earlier builds.')
+def build_command(remove_old):
+  manifest = build()
+  for name, file_name in sorted(manifest.items()):
+    size = os.path.getsize(os.path.join(DIST_DIR, file_name))
+    click.echo(f"{name} -> dist/{file_name} ({size} bytes)")
+  if remove_old:
+    click.echo(f"Removed {len(clean(manifest))} old file(s).")
+
+
+#  Runtime
+#  ----------------------------------------------------------------
+
+asset_files = Blueprint('assets', __name__)
+
+@asset_files.route('/static/dist/<path:filename>')
+def bundle(filename):
+  # the hashed bundle, precompressed when the client takes it; the URL sits
+  # under /static so relative url()s in the CSS still find static/fonts
+  accepted = request.accept_encodings
+  for suffix, encoding in ENCODINGS:
+    if accepted[encoding] and os.path.isfile(os.path.join(DIST_DIR, filename + suffix)):
+      response = send_from_directory(DIST_DIR, filename + suffix, mimetype=mimetype(filename))
+      response.headers['Content-Encoding'] = encoding
+      break
+  else:
+    response = send_from_directory(DIST_DIR, filename, mimetype=mimetype(filename))
+  response.headers['Cache-Control'] = IMMUTABLE
+  response.vary.add('Accept-Encoding')
+  return response
+
+def mimetype(filename):
+  return 'text/css' if filename.endswith('.css') else 'application/javascript'
+
+
+class Assets:
+  # each app's manifest ({} when it serves the source files) is in app.extensions['assets']
+
+  def init_app(self, app):
+    app.register_blueprint(asset_files)
+    app.cli.add_command(assets_cli)
+    app.jinja_env.globals['asset_urls'] = self.urls
+    app.extensions['assets'] = {}
+    if not app.config.get('ASSETS_BUNDLED'):
+      return
+    try:
+      with open(MANIFEST) as manifest:
+        app.extensions['assets'] = json.load(manifest)
+    except FileNotFoundError:
+      app.logger.warning("ASSETS_BUNDLED is on but static/dist/manifest.json is missing; "
+        "serving the source files (run `flask assets build`)")
+
+  @property
+  def manifest(self):
+    return current_app.extensions['assets']
+
+  def urls(self, name):
+    # the URLs to load for bundle `name`
+    if name in self.manifest and current_app.config.get('ASSETS_BUNDLED'):
+      return [url_for('assets.bundle', filename=self.manifest[name])]
+    return [url_for('static', filename=path) for path in BUNDLES[name]]
+
+
+assets = Assets()
@@ -0,0 +1,648 @@
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.parse import quote_plus, urlencode, urlsplit
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from models import db, Venue, Artist, Show
+from counters import reconcile
+from partitions import ensure_partitions
+from bookings import BookingIndex
+from cache import response_cache
+from queries import shows_page
+
+
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#
+# `flask bench seed` fills an empty database with generated venues, artists
+# and shows: the same seed gives the same rows (relative to the day it runs).
+# `flask bench run` requests every route through the test client, recording
+# latency, SQL statements and peak Python memory per route, and with --url
+# also drives a running server over HTTP for throughput. Results are JSON;
+# `flask bench compare` (or run --baseline) fails when a route got slower,
+# hungrier or chattier than a stored baseline by more than the threshold.
+# `flask bench modes` serves the app in its sync and async modes side by
+# side and compares their throughput at the same concurrency.
+#----------------------------------------------------------------------------#
+
+# (city, state), most popular first; picked with Zipf weights, as are genres,
+# and the venues and artists a show goes to
+CITIES = [
+  ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Nashville', 'TN'),
+  ('Austin', 'TX'), ('San Francisco', 'CA'), ('Seattle', 'WA'), ('New Orleans', 'LA'),
+  ('Atlanta', 'GA'), ('Denver', 'CO'), ('Boston', 'MA'), ('Portland', 'OR'),
+  ('Detroit', 'MI'), ('Philadelphia', 'PA'), ('Minneapolis', 'MN'), ('Memphis', 'TN'),
+  ('San Jose', 'CA'), ('Miami', 'FL'), ('Kansas City', 'MO'), ('Albuquerque', 'NM'),
+]
+GENRES = [
+  'Rock n Roll', 'Pop', 'Hip-Hop', 'Jazz', 'Electronic', 'Country', 'R&B', 'Alternative', 'Folk',
+  'Blues', 'Soul', 'Punk', 'Heavy Metal', 'Reggae', 'Funk', 'Classical', 'Instrumental',
+  'Musical Theatre', 'Other',
+]
+VENUE_WORDS = (['The Old', 'Blue', 'Red', 'Golden', 'Electric', 'Velvet', 'Rusty', 'Silver', 'Park Square', 'Midnight'],
+  ['Hall', 'Room', 'Lounge', 'Theater', 'Club', 'Tavern', 'Ballroom', 'Garage', 'Cellar', 'Music & Coffee'])
+ARTIST_WORDS = (['The Wild', 'Guns N', 'Matt', 'Neon', 'Lonesome', 'Brass', 'Static', 'Paper', 'Northern', 'Little'],
+  ['Sax Band', 'Petals', 'Quevado', 'Lights', 'Riders', 'Collective', 'Ghosts', 'Kings', 'Trio', 'Orchestra'])
+
+SEED_BATCH_SIZE = 5000
+# show lengths in minutes, and how many draws per show the seed makes before giving up on
+# finding free slots
+SHOW_DURATIONS = [60, 90, 120, 180]
+SEED_DRAWS = 20
+
+
+def zipf(count, skew=1.1):
+  # cumulative weights for random.choices: rank r is picked in proportion to 1 / r**skew
+  total, cumulative = 0.0, []
+  for rank in range(1, count + 1):
+    total += 1 / rank ** skew
+    cumulative.append(total)
+  return cumulative
+
+
+def entity_rows(rng, count, words, seeking):
+  city_weights, genre_weights = zipf(len(CITIES)), zipf(len(GENRES))
+  for number in range(1, count + 1):
+    city, state = rng.choices(CITIES, cum_weights=city_weights)[0]
+    name = f"{rng.choice(words[0])} {rng.choice(words[1])} {number}"
+    slug = name.lower().replace(' ', '-').replace('&', 'and')
+    row = {
+      'name': name,
+      'city': city,
+      'state': state,
+      'phone': f"{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}",
+      'genres': sorted(set(rng.choices(GENRES, cum_weights=genre_weights, k=rng.randint(1, 3)))),
+      'image_link': f"https://images.example.com/{slug}.jpg",
+      'facebook_link': f"https://www.facebook.com/{slug}",
+      'website': f"https://{slug}.example.com",
+      seeking: rng.random() < 0.3,
+      'seeking_description': "Looking for new acts" if rng.random() < 0.3 else None,
+    }
+    if seeking == 'seeking_talent':
+      row['address'] = f"{rng.randint(1, 2000)} {rng.choice(['Main', 'Folsom', 'Broadway', 'Elm'])} Street"
+    yield row
+
+
+def show_rows(rng, count, venue_ids, artist_ids, now):
+  # a year of past shows and half a year of upcoming ones, on the half hour; a draw that
+  # would double-book its venue or artist is thrown away, as the database would refuse it
+  venue_weights, artist_weights = zipf(len(venue_ids)), zipf(len(artist_ids))
+  bookings = BookingIndex([])
+  drawn = 0
+  for _ in range(count * SEED_DRAWS):
+    row = {
+      'venue_id': rng.choices(venue_ids, cum_weights=venue_weights)[0],
+      'artist_id': rng.choices(artist_ids, cum_weights=artist_weights)[0],
+      'start_time': now + timedelta(minutes=30 * rng.randint(-365 * 48, 182 * 48)),
+      'duration_minutes': rng.choice(SHOW_DURATIONS),
+    }
+    if bookings.conflicts(row):
+      continue
+    bookings.add(row)
+    yield row
+    drawn += 1
+    if drawn == count:
+      return
+
+
+def batched(rows, size=SEED_BATCH_SIZE):
+  batch = []
+  for row in rows:
+    batch.append(row)
+    if len(batch) >= size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
+
+
+def seed(venues, artists, shows, seed=42, now=None):
+  # fills an empty database; returns the ids of the new venues and artists
+  rng = random.Random(seed)
+  now = now or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+  ids = {}
+  for model, count, words, seeking in ((Venue, venues, VENUE_WORDS, 'seeking_talent'),
+                                       (Artist, artists, ARTIST_WORDS, 'seeking_venue')):
+    table = model.__table__
+    ids[model] = []
+    for batch in batched(entity_rows(rng, count, words, seeking)):
+      ids[model] += [entity_id for entity_id, in db.session.execute(table.insert().values(batch).returning(table.c.id))]
+    db.session.commit()
+  for batch in batched(show_rows(rng, shows, ids[Venue], ids[Artist], now)):
+    db.session.execute(Show.__table__.insert().values(batch))
+    db.session.commit()
+  # the past months get their partitions, and the counters start out from the rows just written
+  ensure_partitions()
+  reconcile(repair=True)
+  return ids
+
+
+#----------------------------------------------------------------------------#
+# Suite.
+#----------------------------------------------------------------------------#
+
+# path, headers and form values are formatted with the context from route_context()
+Route = namedtuple('Route', ['name', 'method', 'path', 'headers', 'form'])
+
+def get(name, path, headers=None):
+  return Route(name, 'GET', path, headers or {}, None)
+
+def post(name, path, form):
+  return Route(name, 'POST', path, {}, form)
+
+VENUE_FORM = {'name': 'Bench Venue', 'city': 'Austin', 'state': 'TX', 'address': '1 Main Street', 'phone': '512-555-0100',
+  'genres': ['Jazz', 'Blues'], 'facebook_link': 'https://www.facebook.com/bench', 'image_link': 'https://images.example.com/bench.jpg',
+  'website_link': 'https://bench.example.com', 'seeking_talent': 'y', 'seeking_description': 'Open mic'}
+ARTIST_FORM = {'name': 'Bench Artist', 'city': 'Austin', 'state': 'TX', 'phone': '512-555-0101', 'genres': ['Jazz'],
+  'facebook_link': 'https://www.facebook.com/bench-artist', 'image_link': 'https://images.example.com/bench-artist.jpg',
+  'website_link': 'https://bench-artist.example.com', 'seeking_venue': 'y', 'seeking_description': 'Touring'}
+
+READ_ROUTES = [
+  get('index', '/'),
+  get('venues', '/venues'),
+  get('venues_genre', '/venues?genre={genre}'),
+  get('venue', '/venues/{venue_id}'),
+  get('venue_not_modified', '/venues/{venue_id}', {'If-None-Match': '{venue_etag}'}),
+  post('venue_search', '/venues/search', {'search_term': '{search_term}'}),
+  get('venue_create_form', '/venues/create'),
+  get('venue_edit_form', '/venues/{venue_id}/edit'),
+  get('artists', '/artists'),
+  get('artists_genre', '/artists?genre={genre}'),
+  get('artist', '/artists/{artist_id}'),
+  get('artist_not_modified', '/artists/{artist_id}', {'If-None-Match': '{artist_etag}'}),
+  post('artist_search', '/artists/search', {'search_term': '{search_term}'}),
+  get('artist_create_form', '/artists/create'),
+  get('artist_edit_form', '/artists/{artist_id}/edit'),
+  get('shows', '/shows'),
+  get('shows_next_page', '/shows?after={shows_cursor}'),
+  get('shows_genre', '/shows?genre={genre}'),
+  get('show_create_form', '/shows/create'),
+  get('calendar', '/calendar?city={city}&state={state}'),
+  get('venue_calendar', '/venues/{venue_id}/calendar'),
+  get('artist_calendar', '/artists/{artist_id}/calendar'),
+  get('calendar_ics', '/calendar.ics?city={city}&state={state}'),
+  get('api_venues', '/api/v1/venues'),
+  get('api_artists', '/api/v1/artists'),
+  get('api_shows', '/api/v1/shows'),
+  get('api_venue', '/api/v1/venues/{venue_id}'),
+  get('api_artist', '/api/v1/artists/{artist_id}'),
+  get('metrics', '/_metrics'),
+]
+# these add rows to the database they run against, so they only run with --writes
+WRITE_ROUTES = [
+  post('venue_create', '/venues/create', VENUE_FORM),
+  post('venue_edit', '/venues/{venue_id}/edit', VENUE_FORM),
+  post('artist_create', '/artists/create', ARTIST_FORM),
+  post('artist_edit', '/artists/{artist_id}/edit', ARTIST_FORM),
+  post('show_create', '/shows/create', {'venue_id': '{venue_id}', 'artist_id': '{artist_id}', 'start_time': '{start_time}',
+    'duration_minutes': '60'}),
+]
+
+
+class NextSlot:
+  # formats as the next free hour each time, past the seeded shows, so repeated show_create
+  # posts for the same venue and artist don't conflict with each other
+
+  def __init__(self, start):
+    self.start = start
+    self.hours = itertools.count()
+
+  def __format__(self, spec):
+    return (self.start + timedelta(hours=next(self.hours))).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def route_context(etag):
+  # values for the route templates: the busiest venue, artist and city, a common genre and
+  # search term, a cursor into the shows; etag(path) fetches a page's ETag
+  foreign_keys = {Venue: Show.venue_id, Artist: Show.artist_id}
+  busiest = {}
+  for model, foreign_key in foreign_keys.items():
+    row = db.session.query(foreign_key).group_by(foreign_key).order_by(db.func.count().desc(), foreign_key).first()
+    busiest[model] = row[0] if row else db.session.query(db.func.min(model.id)).scalar()
+  city, state = db.session.query(Venue.city, Venue.state).group_by(Venue.city, Venue.state) \
+    .order_by(db.func.count().desc(), Venue.city, Venue.state).first() or ('', '')
+  context = {
+    'venue_id': busiest[Venue],
+    'artist_id': busiest[Artist],
+    'genre': GENRES[0],
+    'search_term': 'the',
+    'city': quote_plus(city or ''),
+    'state': quote_plus(state or ''),
+    'shows_cursor': shows_page()['next_cursor'] or '',
+    'start_time': NextSlot(datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=200)),
+  }
+  context['venue_etag'] = etag(f"/venues/{context['venue_id']}") or ''
+  context['artist_etag'] = etag(f"/artists/{context['artist_id']}") or ''
+  return context
+
+
+def formatted(route, context):
+  form = None
+  if route.form is not None:
+    form = {key: value.format(**context) if isinstance(value, str) else value for key, value in route.form.items()}
+  return (route.path.format(**context), {key: value.format(**context) for key, value in route.headers.items()}, form)
+
+
+def encoded(route, context):
+  # formatted() for http.client: the form urlencoded into a body
+  path, headers, form = formatted(route, context)
+  if form is None:
+    return path, headers, None
+  return path, dict(headers, **{'Content-Type': 'application/x-www-form-urlencoded'}), urlencode(form, doseq=True)
+
+
+def percentile(values, fraction):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summary(latencies):
+  # milliseconds, from a list of seconds
+  return {
+    'requests': len(latencies),
+    'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+    'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+    'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+    'max_ms': round(max(latencies) * 1000, 3),
+  }
+
+
+class StatementCounter:
+  # SQL statements run by this process, including those of streamed responses
+
+  def __init__(self):
+    self.count = 0
+
+  def __call__(self, *args):
+    self.count += 1
+
+  def __enter__(self):
+    event.listen(Engine, 'before_cursor_execute', self)
+    return self
+
+  def __exit__(self, *exc_info):
+    event.remove(Engine, 'before_cursor_execute', self)
+
+
+def run_in_process(routes, context, seconds, max_requests):
+  # {route name: latency summary, statements, peak memory and size}, one request at a time
+  client = current_app.test_client()
+
+  def request(route):
+    path, headers, form = formatted(route, context)
+    response = client.open(path, method=route.method, headers=headers, data=form)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return response.status_code, size
+
+  results = {}
+  for route in routes:
+    status, size = request(route)  # warm up
+    latencies, statements = [], []
+    started = time.perf_counter()
+    with StatementCounter() as counter:
+      while len(latencies) < max_requests and (len(latencies) < 3 or time.perf_counter() - started < seconds):
+        before, request_started = counter.count, time.perf_counter()
+        request(route)
+        latencies.append(time.perf_counter() - request_started)
+        statements.append(counter.count - before)
+    tracemalloc.start()
+    request(route)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    results[route.name] = dict(summary(latencies), status=status, bytes=size,
+      statements=percentile(statements, 0.5), peak_kb=round(peak / 1024))
+  return results
+
+
+def run_http(url, routes, context, seconds, concurrency):
+  # {route name: throughput and latency}, `concurrency` keep-alive connections per route
+  parts = urlsplit(url)
+  connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+
+  results = {}
+  for route in routes:
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+      connection = connection_class(parts.netloc, timeout=60)
+      mine, failed = [], 0
+      while time.perf_counter() < deadline:
+        # formatted per request, for the context values that change (NextSlot)
+        path, headers, body = encoded(route, context)
+        started = time.perf_counter()
+        try:
+          connection.request(route.method, parts.path.rstrip('/') + path, body=body, headers=headers)
+          response = connection.getresponse()
+          response.read()
+          if response.status >= 400:
+            failed += 1
+        except (OSError, http.client.HTTPException):
+          failed += 1
+          connection.close()
+          connection = connection_class(parts.netloc, timeout=60)
+        mine.append(time.perf_counter() - started)
+      connection.close()
+      with lock:
+        latencies.extend(mine)
+        errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    elapsed = time.perf_counter() - started
+    if latencies:
+      results[route.name] = dict(summary(latencies), concurrency=concurrency, errors=errors[0],
+        rps=round(len(latencies) / elapsed, 1), p99_ms=round(percentile(latencies, 0.99) * 1000, 3))
+  return results
+
+
+def startup_time(runs=3):
+  # milliseconds to import the app and build it, best of `runs` fresh interpreters
+  code = ("import time; started = time.perf_counter(); import app; app.create_app(); "
+          "print((time.perf_counter() - started) * 1000)")
+  times = []
+  for _ in range(runs):
+    output = subprocess.run([sys.executable, '-c', code], cwd=current_app.root_path,
+      capture_output=True, text=True, check=True).stdout
+    times.append(float(output.strip().splitlines()[-1]))
+  return round(min(times), 1)
+
+
+def first_response_time(path='/', runs=3):
+  # milliseconds from starting a fresh server process to the end of its first response to
+  # GET path: the import and create_app() of startup_time, plus what the first request
+  # pays for (connecting to the database, compiling templates, lazy imports); best of `runs`
+  code = ("from werkzeug.serving import make_server; import app; "
+          "server = make_server('127.0.0.1', 0, app.create_app()); "
+          "print(server.server_port, flush=True); server.handle_request()")
+  times = []
+  for _ in range(runs):
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-c', code], cwd=current_app.root_path,
+      stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+      port = server.stdout.readline().strip()
+      if not port:
+        raise click.ClickException("the server process exited before it was listening")
+      connection = http.client.HTTPConnection('127.0.0.1', int(port), timeout=60)
+      connection.request('GET', path)
+      response = connection.getresponse()
+      response.read()
+      times.append((time.perf_counter() - started) * 1000)
+      connection.close()
+      if response.status >= 400:
+        raise click.ClickException(f"GET {path} on a fresh server answered {response.status}")
+    finally:
+      server.stdout.close()
+      server.wait(timeout=60)
+  return round(min(times), 1)
+
+
+# how each mode serves the app, on the port appended to the command
+SERVE_COMMANDS = {
+  # `python app.py`: werkzeug's threaded server, a thread per connection
+  'sync': [sys.executable, '-c', "import logging, sys; from werkzeug.serving import make_server; import app; "
+    "logging.getLogger('werkzeug').setLevel(logging.ERROR); "
+    "make_server('127.0.0.1', int(sys.argv[1]), app.create_app(), threaded=True).serve_forever()"],
+  # `uvicorn asgi:application`: one event loop, see asgi.py
+  'async': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1', '--no-access-log',
+    '--log-level', 'warning', '--port'],
+}
+
+
+def free_port():
+  with socket.socket() as sock:
+    sock.bind(('127.0.0.1', 0))
+    return sock.getsockname()[1]
+
+
+@contextmanager
+def serving(mode, cache=False):
+  # the URL of a fresh server process running the app in `mode`, stopped afterwards
+  port = free_port()
+  env = dict(os.environ) if cache else dict(os.environ, CACHE_BACKEND='none')
+  # quiet: under load the servers log every slow statement
+  server = subprocess.Popen(SERVE_COMMANDS[mode] + [str(port)], cwd=current_app.root_path, env=env,
+    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+  try:
+    deadline = time.perf_counter() + 60
+    while True:
+      try:
+        socket.create_connection(('127.0.0.1', port), timeout=1).close()
+        break
+      except OSError:
+        if server.poll() is not None or time.perf_counter() > deadline:
+          raise click.ClickException(f"the {mode} server didn't start; run {shlex.join(SERVE_COMMANDS[mode] + [str(port)])} to see why")
+        time.sleep(0.1)
+    yield f"http://127.0.0.1:{port}"
+  finally:
+    server.terminate()
+    server.wait(timeout=30)
+
+
+def git_revision():
+  try:
+    return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=current_app.root_path,
+      capture_output=True, text=True).stdout.strip() or None
+  except OSError:
+    return None
+
+
+#  Comparison
+#  ----------------------------------------------------------------
+
+# (section, metric, worse when higher); differences below the noise floor never count
+METRICS = [
+  ('routes', 'p50_ms', True), ('routes', 'p95_ms', True), ('routes', 'statements', True), ('routes', 'peak_kb', True),
+  ('http', 'rps', False), ('http', 'p50_ms', True), ('http', 'p95_ms', True),
+]
+NOISE_FLOOR = {'p50_ms': 1.0, 'p95_ms': 2.0, 'peak_kb': 64, 'rps': 5.0, 'statements': 0, 'startup_ms': 20.0,
+  'first_response_ms': 50.0}
+
+
+def regressions(current, baseline, threshold):
+  # [(what, baseline value, current value)] of the metrics that got worse by more than threshold
+  found = []
+  def check(what, metric, old, new, worse_when_higher=True):
+    change = (new - old) if worse_when_higher else (old - new)
+    if change > NOISE_FLOOR[metric] and change > abs(old) * threshold:
+      found.append((what, old, new))
+  for section, metric, worse_when_higher in METRICS:
+    for name, old in baseline.get(section, {}).items():
+      new = current.get(section, {}).get(name)
+      if new is not None and metric in old and metric in new:
+        check(f"{section}.{name}.{metric}", metric, old[metric], new[metric], worse_when_higher)
+  for metric in ('startup_ms', 'first_response_ms'):
+    if metric in baseline and metric in current:
+      check(metric, metric, baseline[metric], current[metric])
+  return found
+
+
+def report(found, threshold):
+  for what, old, new in found:
+    click.echo(f"REGRESSION {what}: {old} -> {new}", err=True)
+  click.echo(f"{len(found)} regression(s) beyond {threshold:.0%}.")
+  return not found
+
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+bench_cli = AppGroup('bench', help='Seed benchmark data, run the benchmark suite and compare results.')
+
+@bench_cli.command('seed')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=1000, show_default=True)
+@click.option('--shows', default=10000, show_default=True)
+@click.option('--seed', 'seed_value', default=42, show_default=True, help='Same seed, same data.')
+def seed_command(venues, artists, shows, seed_value):
+  if db.session.query(Venue.id).first() or db.session.query(Artist.id).first():
+    raise click.ClickException("the database already has venues or artists; seed an empty one")
+  started = time.perf_counter()
+  seed(venues, artists, shows, seed_value)
+  click.echo(f"Seeded {venues} venues, {artists} artists and {shows} shows in {time.perf_counter() - started:.1f}s.")
+
+
+@bench_cli.command('run')
+@click.option('--url', help='Also load a server running this app at this URL over HTTP.')
+@click.option('--concurrency', default=8, show_default=True, help='Connections per route for --url.')
+@click.option('--seconds', default=3.0, show_default=True, help='Time spent on each route.')
+@click.option('--requests', 'max_requests', default=200, show_default=True, help='At most this many in-process requests per route.')
+@click.option('--route', 'only', multiple=True, help='Run only these routes (repeatable).')
+@click.option('--writes', is_flag=True, help='Include the create and edit routes; they add rows to the database.')
+@click.option('--cache', is_flag=True, help='Keep the page cache on instead of measuring the queries behind it.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the results here as JSON.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='Compare against these results; exit 1 on a regression.')
+@click.option('--threshold', default=0.2, show_default=True, help='Relative change that counts as a regression.')
+def run_command(url, concurrency, seconds, max_requests, only, writes, cache, output, baseline, threshold):
+  app = current_app._get_current_object()
+  app.config['WTF_CSRF_ENABLED'] = False
+  if not cache:
+    app.config['CACHE_BACKEND'] = None
+    response_cache.init_app(app)
+  routes = READ_ROUTES + (WRITE_ROUTES if writes else [])
+  if only:
+    routes = [route for route in routes if route.name in only]
+
+  client = app.test_client()
+  context = route_context(lambda path: client.get(path).headers.get('ETag'))
+  results = {
+    'meta': {
+      'created': datetime.utcnow().isoformat(timespec='seconds'),
+      'revision': git_revision(),
+      'python': platform.python_version(),
+      'rows': {model.__tablename__: db.session.query(db.func.count(model.id)).scalar() for model in (Venue, Artist, Show)},
+      'cache': cache,
+    },
+    'startup_ms': startup_time(),
+    'first_response_ms': first_response_time(),
+    'routes': run_in_process(routes, context, seconds, max_requests),
+  }
+  if url:
+    def etag(path):
+      connection = http.client.HTTPConnection(urlsplit(url).netloc, timeout=60)
+      try:
+        connection.request('GET', urlsplit(url).path.rstrip('/') + path)
+        return connection.getresponse().getheader('ETag')
+      finally:
+        connection.close()
+    http_context = dict(context, venue_etag=etag(f"/venues/{context['venue_id']}") or '',
+      artist_etag=etag(f"/artists/{context['artist_id']}") or '')
+    # writes would need CSRF tokens from the server
+    results['http'] = run_http(url, [route for route in routes if route not in WRITE_ROUTES], http_context, seconds, concurrency)
+
+  click.echo(f"{'route':<22}{'p50 ms':>10}{'p95 ms':>10}{'sql':>6}{'peak KB':>10}" + (f"{'req/s':>10}" if url else ''))
+  for name, result in results['routes'].items():
+    line = f"{name:<22}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['statements']:>6}{result['peak_kb']:>10}"
+    if url and name in results['http']:
+      line += f"{results['http'][name]['rps']:>10.1f}"
+    click.echo(line)
+  click.echo(f"startup {results['startup_ms']} ms, first response {results['first_response_ms']} ms")
+  if output:
+    with open(output, 'w') as out:
+      json.dump(results, out, indent=2)
+  if baseline:
+    with open(baseline) as base:
+      if not report(regressions(results, json.load(base), threshold), threshold):
+        sys.exit(1)
+
+
+# the routes asgi.py serves from asyncio, then read pages it passes to the Flask app
+MODE_ROUTES = ['index', 'api_venue', 'api_artist', 'venue', 'shows']
+
+@bench_cli.command('modes')
+@click.option('--sync-url', help='Load this running sync server instead of starting one.')
+@click.option('--async-url', help='Load this running `uvicorn asgi:application` instead of starting one.')
+@click.option('--concurrency', default=200, show_default=True, help='Keep-alive connections per route.')
+@click.option('--seconds', default=10.0, show_default=True, help='Time spent on each route in each mode.')
+@click.option('--route', 'only', multiple=True, help=f"Run only these routes (repeatable); {', '.join(MODE_ROUTES)} by default.")
+@click.option('--cache', is_flag=True, help='Keep the page cache on in the servers started here.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the results here as JSON.')
+def modes_command(sync_url, async_url, concurrency, seconds, only, cache, output):
+  """Compare requests per second of the sync and async serving modes."""
+  names = only or MODE_ROUTES
+  routes = [route for route in READ_ROUTES if route.name in names]
+  context = route_context(lambda path: None)
+  results = {
+    'meta': {
+      'created': datetime.utcnow().isoformat(timespec='seconds'),
+      'revision': git_revision(),
+      'python': platform.python_version(),
+      'cpus': os.cpu_count(),
+      'rows': {model.__tablename__: db.session.query(db.func.count(model.id)).scalar() for model in (Venue, Artist, Show)},
+      'concurrency': concurrency,
+      'cache': cache,
+    },
+  }
+  for mode, url in (('sync', sync_url), ('async', async_url)):
+    if url:
+      results[mode] = run_http(url, routes, context, seconds, concurrency)
+    else:
+      with serving(mode, cache) as started_url:
+        results[mode] = run_http(started_url, routes, context, seconds, concurrency)
+
+  click.echo(f"{concurrency} connections, {seconds:.0f}s per route and mode")
+  click.echo(f"{'route':<14}{'sync req/s':>12}{'async req/s':>12}{'sync p50':>10}{'async p50':>10}{'errors':>8}")
+  for route in routes:
+    sync, async_ = results['sync'].get(route.name), results['async'].get(route.name)
+    if not sync or not async_:
+      continue
+    click.echo(f"{route.name:<14}{sync['rps']:>12.1f}{async_['rps']:>12.1f}{sync['p50_ms']:>10.1f}{async_['p50_ms']:>10.1f}"
+      f"{sync['errors'] + async_['errors']:>8}")
+  if output:
+    with open(output, 'w') as out:
+      json.dump(results, out, indent=2)
+
+
+@bench_cli.command('compare')
+@click.argument('current', type=click.Path(exists=True, dir_okay=False))
+@click.argument('baseline', type=click.Path(exists=True, dir_okay=False))
+@click.option('--threshold', default=0.2, show_default=True, help='Relative change that counts as a regression.')
+def compare_command(current, baseline, threshold):
+  """Compare CURRENT results against BASELINE; exit 1 on a regression."""
+  with open(current) as new, open(baseline) as old:
+    if not report(regressions(json.load(new), json.load(old), threshold), threshold):
+      sys.exit(1)
@@ -0,0 +1,123 @@
+import http.client
+import itertools
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+import click
+from werkzeug.serving import WSGIRequestHandler, make_server
+from app import create_app
+from models import db, Venue
+from cache import response_cache
+from bench import READ_ROUTES, encoded, percentile, route_context, seed, summary
+
+
+#----------------------------------------------------------------------------#
+# Concurrent load test.
+#
+# Serves the app from a threaded server in this process (or loads --url) and
+# drives a mix of read routes from 1, 8 and 32 keep-alive connections in
+# turn, more than the pool's DB_POOL_SIZE + DB_MAX_OVERFLOW at the top, with
+# the page cache off. Latency grows with concurrency as requests queue for
+# the GIL and for pooled connections; what must not happen is a failed
+# request (a pool timeout, a statement timeout) or a p99 that runs away from
+# the median. The script exits 1 on either.
+#
+#   DATABASE_URL=postgresql://localhost/fyyur_bench FLASK_ENV=production SECRET_KEY=bench python bench_load.py
+#
+# Search is left out: without the trigram indexes it reads the whole table.
+#----------------------------------------------------------------------------#
+
+ROUTES = ['index', 'venue', 'artist', 'shows', 'shows_next_page', 'venue_calendar', 'calendar', 'api_venue']
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+  # no access log line per request
+
+  def log_request(self, *args):
+    pass
+
+
+def load(url, routes, context, seconds, concurrency):
+  # latency summary of `concurrency` connections cycling through the routes for `seconds`
+  parts = urlsplit(url)
+  latencies, errors, lock = [], [0], threading.Lock()
+  deadline = time.perf_counter() + seconds
+
+  def worker(offset):
+    connection = http.client.HTTPConnection(parts.netloc, timeout=60)
+    mine, failed = [], 0
+    for route in itertools.islice(itertools.cycle(routes), offset, None):
+      if time.perf_counter() >= deadline:
+        break
+      path, headers, body = encoded(route, context)
+      started = time.perf_counter()
+      try:
+        connection.request(route.method, parts.path.rstrip('/') + path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        if response.status >= 400:
+          failed += 1
+      except (OSError, http.client.HTTPException):
+        failed += 1
+        connection.close()
+        connection = http.client.HTTPConnection(parts.netloc, timeout=60)
+      mine.append(time.perf_counter() - started)
+    connection.close()
+    with lock:
+      latencies.extend(mine)
+      errors[0] += failed
+
+  started = time.perf_counter()
+  threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - started
+  return dict(summary(latencies), errors=errors[0], rps=round(len(latencies) / elapsed, 1),
+    p99_ms=round(percentile(latencies, 0.99) * 1000, 3))
+
+
+@click.command()
+@click.option('--url', help='Load this running server instead of one started here.')
+@click.option('--concurrency', 'levels', default=[1, 8, 32], multiple=True, show_default=True, type=int)
+@click.option('--seconds', default=10.0, show_default=True, help='Time spent at each concurrency.')
+@click.option('--max-tail', default=10.0, show_default=True, help='Largest p99 / p50 ratio that passes.')
+def main(url, levels, seconds, max_tail):
+  app = create_app()
+  app.config['CACHE_BACKEND'] = None
+  response_cache.init_app(app)
+  server = None
+  if not url:
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+
+  with app.app_context():
+    if not db.session.query(Venue.id).first():
+      seed(2000, 2000, 50000)
+    client = app.test_client()
+    context = route_context(lambda path: client.get(path).headers.get('ETag'))
+    pool = f"{app.config['DB_POOL_SIZE']} + {app.config['DB_MAX_OVERFLOW']} overflow"
+  routes = [route for route in READ_ROUTES if route.name in ROUTES]
+
+  click.echo(f"{url}, pool {pool}, {seconds:.0f}s per level")
+  click.echo(f"{'connections':>12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+  failed = False
+  for concurrency in levels:
+    result = load(url, routes, context, seconds, concurrency)
+    tail = result['p99_ms'] / result['p50_ms']
+    click.echo(f"{concurrency:>12}{result['rps']:>10.1f}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+      f"{result['p99_ms']:>10.1f}{result['errors']:>8}")
+    if result['errors'] or tail > max_tail:
+      click.echo(f"FAIL at {concurrency} connections: {result['errors']} errors, p99 {tail:.1f}x p50")
+      failed = True
+  if server is not None:
+    server.shutdown()
+  if failed:
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,138 @@
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import click
+from flask import current_app, render_template
+from app import create_app
+from models import db, Venue, Artist, Show
+from queries import ShowListing, read, iter_shows
+from bench import seed
+
+
+#----------------------------------------------------------------------------#
+# Read model memory benchmark.
+#
+# Loads ROWS shows and renders pages/shows.html with all of them, three ways:
+#   entities:    Show entities with their Venue and Artist loaded, turned into
+#                a dict per row, as the listing views used to
+#   read_models: ShowListing named tuples from a column projection, rendered
+#                in one piece
+#   streamed:    the same named tuples from a server-side cursor, rendered
+#                chunk by chunk as stream_template() does
+# and reports the traced Python memory per row held once loaded and at its
+# peak while loading (entities, the identity map, ...), the traced peak of
+# the whole load and render, and the process's peak RSS. Each variant runs in a process of its
+# own, once under tracemalloc and once without for the RSS.
+#
+#   DATABASE_URL=postgresql://localhost/fyyur_bench python bench_memory.py
+#----------------------------------------------------------------------------#
+
+VARIANTS = ['entities', 'read_models', 'streamed']
+
+
+def projection(rows):
+  # the first `rows` shows, as the shows listing selects them
+  return db.session.query(
+      Show.id,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link'),
+      Show.start_time
+    ).join(Venue, Show.venue_id == Venue.id) \
+    .join(Artist, Show.artist_id == Artist.id) \
+    .order_by(Show.start_time, Show.id) \
+    .limit(rows)
+
+
+def load(variant, rows):
+  if variant == 'entities':
+    shows = Show.query.options(db.joinedload(Show.venue), db.joinedload(Show.artist)) \
+      .order_by(Show.start_time, Show.id).limit(rows).all()
+    return [{
+      "venue_id": show.venue_id,
+      "venue_name": show.venue.name,
+      "artist_id": show.artist_id,
+      "artist_name": show.artist.name,
+      "artist_image_link": show.artist.image_link,
+      "start_time": show.start_time,
+    } for show in shows]
+  if variant == 'read_models':
+    return read(ShowListing, projection(rows))
+  # streamed: nothing is held before rendering
+  return None
+
+
+def render(variant, shows, rows):
+  # the rendered page's size in characters
+  context = dict(genre=None, next_cursor=None, prev_cursor=None)
+  if variant != 'streamed':
+    return len(render_template('pages/shows.html', shows=shows, **context))
+  shows = (ShowListing._make(row) for row in itertools.islice(iter_shows(), rows))
+  template = current_app.jinja_env.get_template('pages/shows.html')
+  return sum(len(chunk) for chunk in template.generate(shows=shows, **context))
+
+
+def measure(variant, rows, trace):
+  # {'rows', 'seconds', 'characters', and under tracemalloc 'row_bytes', 'load_row_bytes'
+  # and 'peak_bytes', otherwise 'rss_kb'}
+  app = create_app()
+  with app.test_request_context('/shows'):
+    if trace:
+      tracemalloc.start()
+    started = time.perf_counter()
+    before = tracemalloc.get_traced_memory()[0] if trace else 0
+    shows = load(variant, rows)
+    loaded, load_peak = tracemalloc.get_traced_memory() if trace else (0, 0)
+    characters = render(variant, shows, rows)
+    result = {'rows': rows, 'seconds': round(time.perf_counter() - started, 2), 'characters': characters}
+    if trace:
+      result['row_bytes'] = round((loaded - before) / rows)
+      result['load_row_bytes'] = round((load_peak - before) / rows)
+      result['peak_bytes'] = tracemalloc.get_traced_memory()[1] - before
+      tracemalloc.stop()
+    else:
+      # kilobytes on Linux
+      result['rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    db.session.remove()
+  return result
+
+
+@click.command()
+@click.option('--rows', default=100000, show_default=True)
+@click.option('--variant', type=click.Choice(VARIANTS), help='Measure this variant here and print JSON (used by the runs).')
+@click.option('--trace', is_flag=True, help='With --variant: measure under tracemalloc.')
+def main(rows, variant, trace):
+  if variant:
+    click.echo(json.dumps(measure(variant, rows, trace)))
+    return
+
+  app = create_app()
+  with app.app_context():
+    shows = db.session.query(db.func.count(Show.id)).scalar()
+    if shows < rows:
+      if shows:
+        raise click.ClickException(f"the database has {shows} shows, fewer than --rows; use an empty one")
+      seed(2000, 2000, rows)
+
+  def run(variant, trace):
+    command = [sys.executable, os.path.abspath(__file__), '--rows', str(rows), '--variant', variant] + (['--trace'] if trace else [])
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+  click.echo(f"{rows} rows")
+  click.echo(f"{'variant':<14}{'held B/row':>12}{'load B/row':>12}{'peak MB':>10}{'RSS MB':>10}{'seconds':>10}")
+  for name in VARIANTS:
+    traced, untraced = run(name, True), run(name, False)
+    click.echo(f"{name:<14}{traced['row_bytes']:>12}{traced['load_row_bytes']:>12}{traced['peak_bytes'] / 2 ** 20:>10.1f}"
+      f"{untraced['rss_kb'] / 1024:>10.1f}{untraced['seconds']:>10.2f}")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,75 @@
+import time
+from datetime import datetime, timedelta
+import click
+from flask import render_template
+from app import create_app
+from queries import ShowListing
+
+
+#----------------------------------------------------------------------------#
+# Show tile micro-benchmark.
+#
+# Renders pages/shows.html with 10k show tiles, each start time going through
+# the `datetime` filter, three ways:
+#   before:  start times as strftime() strings, parsed back with dateutil and
+#            formatted with babel.dates.format_datetime(), as the filter did
+#   strings: the same strings through the current filter (older callers)
+#   after:   datetimes through the current filter, with its cached patterns
+# No database is needed.
+#
+#   python bench_tiles.py
+#----------------------------------------------------------------------------#
+
+def format_datetime_before(value, format='medium'):
+  # the filter as it was
+  import babel.dates
+  import dateutil.parser
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+
+def tiles(count, as_strings):
+  start = datetime(2030, 1, 1, 20, 0)
+  shows = []
+  for index in range(count):
+    start_time = start + timedelta(hours=index)
+    shows.append(ShowListing(index, index % 100, f'Venue {index % 100}', index % 250, f'Artist {index % 250}',
+      'https://images.example.com/artist.jpg', start_time.strftime('%Y-%m-%d %H:%M:%S') if as_strings else start_time))
+  return shows
+
+
+@click.command()
+@click.option('--tiles', 'count', default=10000, show_default=True)
+@click.option('--runs', default=5, show_default=True, help='Renders per variant; the fastest counts.')
+def main(count, runs):
+  app = create_app()
+  current_filter = app.jinja_env.filters['datetime']
+  variants = [
+    ('before', format_datetime_before, tiles(count, as_strings=True)),
+    ('strings', current_filter, tiles(count, as_strings=True)),
+    ('after', current_filter, tiles(count, as_strings=False)),
+  ]
+  results = {}
+  with app.test_request_context('/shows'):
+    for name, datetime_filter, shows in variants:
+      app.jinja_env.filters['datetime'] = datetime_filter
+      timings = []
+      for _ in range(runs):
+        started = time.perf_counter()
+        render_template('pages/shows.html', shows=shows, genre=None, next_cursor=None, prev_cursor=None)
+        timings.append(time.perf_counter() - started)
+      results[name] = min(timings)
+  app.jinja_env.filters['datetime'] = current_filter
+
+  click.echo(f"{'variant':<10}{'ms':>10}{'us/tile':>10}")
+  for name, seconds in results.items():
+    click.echo(f"{name:<10}{seconds * 1000:>10.1f}{seconds / count * 1e6:>10.1f}")
+  click.echo(f"after is {results['before'] / results['after']:.1f}x faster than before")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import click
+
+# seeding half a million shows runs statements longer than the default DB_STATEMENT_TIMEOUT;
+# read by config.py when it is imported
+os.environ.setdefault('DB_STATEMENT_TIMEOUT', '0')
+
+from app import create_app
+from models import db, Venue
+from cache import response_cache
+from bench import StatementCounter, seed, summary
+
+
+#----------------------------------------------------------------------------#
+# /venues regression benchmark.
+#
+# Seeds an empty database (DATABASE_URL, migrated) with 10k venues and 500k
+# shows, then requests /venues with the page cache off. The listing has to
+# come back in MAX_STATEMENTS statements however many venues and areas there
+# are; the script exits 1 when it takes more.
+#
+#   DATABASE_URL=postgresql://localhost/fyyur_bench python bench_venues.py
+#----------------------------------------------------------------------------#
+
+MAX_STATEMENTS = 1
+
+
+@click.command()
+@click.option('--venues', default=10000, show_default=True)
+@click.option('--artists', default=10000, show_default=True)
+@click.option('--shows', default=500000, show_default=True)
+@click.option('--requests', 'count', default=20, show_default=True, help='Timed requests.')
+def main(venues, artists, shows, count):
+  app = create_app()
+  app.config['CACHE_BACKEND'] = None
+  response_cache.init_app(app)
+  with app.app_context():
+    if not db.session.query(Venue.id).first():
+      started = time.perf_counter()
+      seed(venues, artists, shows)
+      db.session.execute('ANALYZE')
+      db.session.commit()
+      click.echo(f"Seeded {venues} venues, {artists} artists and {shows} shows in {time.perf_counter() - started:.1f}s.")
+    rows = db.session.query(db.func.count(Venue.id)).scalar()
+
+  client = app.test_client()
+
+  def request():
+    with client.get('/venues') as response:
+      assert response.status_code == 200
+      return response.get_data()
+
+  request()  # warm up
+  latencies, statements = [], []
+  with StatementCounter() as counter:
+    for _ in range(count):
+      before, started = counter.count, time.perf_counter()
+      request()
+      latencies.append(time.perf_counter() - started)
+      statements.append(counter.count - before)
+
+  result = summary(latencies)
+  click.echo(f"/venues over {rows} venues: p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, "
+    f"{max(statements)} statement(s) per request")
+  if max(statements) > MAX_STATEMENTS:
+    click.echo(f"FAIL: more than {MAX_STATEMENTS} statement(s) per request")
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,98 @@
+from collections import defaultdict
+from datetime import timedelta
+from sortedcontainers import SortedList
+from models import db, ShowBooking, slot
+
+
+#----------------------------------------------------------------------------#
+# Booking conflicts.
+#
+# A show holds its venue and its artist for [start_time, start_time +
+# duration_minutes). ShowBooking's exclusion constraints reject a show that
+# overlaps another of the same venue or artist, whoever writes it; each check
+# is a search of a GiST index, O(log n) in the bookings.
+#
+# conflicts() asks the same question before a form is submitted, so the
+# submitter learns which side is taken. BookingIndex answers it in memory
+# for a batch of imported shows: it loads the bookings the batch could clash
+# with in one query, then checks and adds each show in O(log n).
+#----------------------------------------------------------------------------#
+
+SIDES = ('venue', 'artist')
+# minutes, when a show doesn't say; Show.duration_minutes has the same default
+DEFAULT_DURATION = 120
+
+
+def show_interval(show):
+  # [start, end) of a show given as a dict of Show columns
+  start = show['start_time']
+  return start, start + timedelta(minutes=int(show.get('duration_minutes') or DEFAULT_DURATION))
+
+
+def conflicts(show):
+  # the sides, of 'venue' and 'artist', already booked during the show; one statement
+  # probing each side's exclusion index
+  try:
+    entity_ids = {side: int(show[f'{side}_id']) for side in SIDES}
+  except (TypeError, ValueError):
+    # not ids at all; writing the show fails on them instead
+    return []
+  during = db.func.tsrange(*show_interval(show))
+  booked = [
+    db.session.query(ShowBooking.show_id).filter(
+      slot(getattr(ShowBooking, f'{side}_id')).op('&&')(slot(entity_ids[side])),
+      ShowBooking.during.op('&&')(during)
+    ).exists()
+    for side in SIDES
+  ]
+  return [side for side, taken in zip(SIDES, db.session.query(*booked).one()) if taken]
+
+
+class IntervalIndex:
+  # the intervals booked per key, which never overlap each other, as (start, end) in a
+  # SortedList: adding one and finding its neighbour are O(log n) in the key's intervals
+
+  def __init__(self):
+    self.intervals = defaultdict(SortedList)
+
+  def overlaps(self, key, start, end):
+    # of the intervals starting before `end`, only the last can reach past `start`;
+    # disjoint intervals sorted by start are sorted by end as well
+    intervals = self.intervals[key]
+    index = intervals.bisect_left((end,))
+    return index > 0 and intervals[index - 1][1] > start
+
+  def add(self, key, start, end):
+    self.intervals[key].add((start, end))
+
+
+class BookingIndex:
+  # the venue and artist bookings a batch of shows can clash with, plus the batch's own
+
+  def __init__(self, shows):
+    self.indexes = {side: IntervalIndex() for side in SIDES}
+    if not shows:
+      return
+    intervals = [show_interval(show) for show in shows]
+    window = db.func.tsrange(min(start for start, _ in intervals), max(end for _, end in intervals))
+    for side in SIDES:
+      column = getattr(ShowBooking, f'{side}_id')
+      entity_ids = sorted({int(show[f'{side}_id']) for show in shows})
+      # probes the side's exclusion index once per id
+      keys = db.func.unnest(db.cast(entity_ids, db.ARRAY(db.Integer))).alias('key')
+      booked = db.session.query(column, db.func.lower(ShowBooking.during), db.func.upper(ShowBooking.during)) \
+        .join(keys, slot(column).op('&&')(slot(db.column('key')))) \
+        .filter(ShowBooking.during.op('&&')(window)) \
+        .order_by(column, ShowBooking.during)
+      for entity_id, start, end in booked:
+        self.indexes[side].add(entity_id, start, end)
+
+  def conflicts(self, show):
+    # like conflicts() above, for a show of the batch, against the bookings loaded and the shows added
+    start, end = show_interval(show)
+    return [side for side in SIDES if self.indexes[side].overlaps(int(show[f'{side}_id']), start, end)]
+
+  def add(self, show):
+    start, end = show_interval(show)
+    for side in SIDES:
+      self.indexes[side].add(int(show[f'{side}_id']), start, end)
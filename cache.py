@@ -0,0 +1,277 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import Response, current_app, make_response, request, session
+from models import db, Venue, Artist, Show
+from queries import entity_version
+from assets import assets
+
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#
+# Rendered pages are cached under one key per route and entity ("venues",
+# "venue:3", ...). Write handlers invalidate exactly the keys their change
+# shows up on; entries otherwise expire after CACHE_TTL seconds.
+#----------------------------------------------------------------------------#
+
+class LRUCache:
+  # in-process cache bounded to max_entries, least recently used evicted first
+
+  def __init__(self, max_entries=1024, ttl=60):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self.entries = OrderedDict()
+    self.lock = threading.Lock()
+    self.evictions = 0
+
+  def get(self, key):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      value, expires_at = entry
+      if expires_at < time.monotonic():
+        del self.entries[key]
+        return None
+      self.entries.move_to_end(key)
+      return value
+
+  def set(self, key, value):
+    with self.lock:
+      self.entries[key] = (value, time.monotonic() + self.ttl)
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.max_entries:
+        self.entries.popitem(last=False)
+        self.evictions += 1
+
+  def delete(self, *keys):
+    with self.lock:
+      for key in keys:
+        self.entries.pop(key, None)
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+
+
+class RedisCache:
+  # cache shared by every worker; needs the optional `redis` package
+
+  def __init__(self, url, ttl=60, prefix='fyyur:page:'):
+    try:
+      import redis
+    except ImportError:
+      raise RuntimeError("CACHE_BACKEND = 'redis' requires the redis package (pip install redis)")
+    self.client = redis.Redis.from_url(url)
+    self.ttl = ttl
+    self.prefix = prefix
+
+  @property
+  def evictions(self):
+    # evictions are server-wide, Redis applies its own maxmemory policy
+    return self.client.info('stats').get('evicted_keys', 0)
+
+  def get(self, key):
+    value = self.client.get(self.prefix + key)
+    return value.decode('utf-8') if value is not None else None
+
+  def set(self, key, value):
+    self.client.set(self.prefix + key, value.encode('utf-8'), ex=self.ttl)
+
+  def delete(self, *keys):
+    if keys:
+      self.client.delete(*[self.prefix + key for key in keys])
+
+  def clear(self):
+    keys = list(self.client.scan_iter(self.prefix + '*'))
+    if keys:
+      self.client.delete(*keys)
+
+
+class CacheState:
+  # one app's backend and hit counts, in app.extensions['response_cache']
+
+  def __init__(self, backend):
+    self.backend = backend
+    self.hits = 0
+    self.misses = 0
+
+
+class ResponseCache:
+  # picks the backend from config['CACHE_BACKEND'] ('lru', 'redis' or None to disable);
+  # every app gets its own
+
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    # again on the same app (bench run does), only the backend is replaced
+    backend = app.config.get('CACHE_BACKEND', 'lru')
+    ttl = app.config.get('CACHE_TTL', 60)
+    if backend == 'lru':
+      backend = LRUCache(app.config.get('CACHE_MAX_ENTRIES', 1024), ttl)
+    elif backend == 'redis':
+      backend = RedisCache(app.config['CACHE_REDIS_URL'], ttl)
+    else:
+      backend = None
+    if 'response_cache' not in app.extensions:
+      app.after_request(keep_private)
+    app.extensions['response_cache'] = CacheState(backend)
+
+  def state(self, app=None):
+    return (app or current_app).extensions['response_cache']
+
+  @property
+  def backend(self):
+    return self.state().backend
+
+  @property
+  def stats(self):
+    state = self.state()
+    return {
+      "hits": state.hits,
+      "misses": state.misses,
+      "evictions": state.backend.evictions if state.backend else 0,
+    }
+
+  def invalidate(self, *keys):
+    if self.backend:
+      self.backend.delete(*keys)
+
+  def cached(self, key):
+    # caches a GET view's rendered body under key(**view_args); a key of None skips the cache
+    def decorator(view):
+      @wraps(view)
+      def wrapper(**kwargs):
+        state = self.state()
+        # a pending flash message is rendered into the page, so neither serve nor store it
+        cache_key = key(**kwargs) if state.backend and not session.get('_flashes') else None
+        if cache_key is None:
+          return view(**kwargs)
+
+        body = state.backend.get(cache_key)
+        if body is not None:
+          state.hits += 1
+          return body
+        state.misses += 1
+        body = view(**kwargs)
+        if isinstance(body, str):
+          state.backend.set(cache_key, body)
+        elif isinstance(body, Response) and body.is_streamed:
+          body.response = self.filled(state.backend, cache_key, body.response)
+        return body
+      return wrapper
+    return decorator
+
+  def filled(self, backend, cache_key, chunks):
+    # passes a streamed body through and stores it once all of it has been sent
+    parts = []
+    try:
+      for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    finally:
+      if hasattr(chunks, 'close'):
+        chunks.close()
+    backend.set(cache_key, "".join(parts))
+
+
+response_cache = ResponseCache()
+
+
+#  Conditional requests
+#  ----------------------------------------------------------------
+
+def page_release():
+  # changes with the templates (RELEASE) and with the asset URLs rendered into them
+  return f"{current_app.config.get('RELEASE')}:{','.join(sorted(assets.manifest.values()))}"
+
+def conditional(model):
+  # ETag, Last-Modified and a public Cache-Control on a venue/artist page, from
+  # the version entity_version() looks up. A client or proxy whose copy is still
+  # current gets a 304 before the view (or the response cache) is reached.
+  def decorator(view):
+    @wraps(view)
+    def wrapper(**kwargs):
+      # a page with a flash message on it belongs to one client only
+      if session.get('_flashes'):
+        response = make_response(view(**kwargs))
+        response.cache_control.no_store = True
+        return response
+
+      now = datetime.utcnow()
+      entity_id, = kwargs.values()
+      version = entity_version(model, entity_id, now)
+      if version is None:
+        return view(**kwargs)
+      updated_at, last_start, next_start = version
+      etag = hashlib.sha1(f"{model.__tablename__}:{entity_id}:{updated_at}:{next_start}:{page_release()}".encode()).hexdigest()
+      last_modified = max(value for value in (updated_at, last_start, datetime.min) if value is not None)
+
+      if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+      else:
+        fresh = request.if_modified_since is not None and last_modified.replace(microsecond=0) <= request.if_modified_since
+      response = Response(status=304) if fresh else make_response(view(**kwargs))
+
+      response.set_etag(etag, weak=True)
+      response.last_modified = last_modified
+      response.cache_control.public = True
+      # fresh until the next show starts, at most ENTITY_PAGE_MAX_AGE seconds
+      max_age = current_app.config.get('ENTITY_PAGE_MAX_AGE', 60)
+      if next_start is not None:
+        max_age = min(max_age, int((next_start - now).total_seconds()))
+      response.cache_control.max_age = max_age
+      return response
+    return wrapper
+  return decorator
+
+
+def keep_private(response):
+  # after each request: a response that sets the session cookie (a show job reported,
+  # a flash taken) belongs to its client alone, whatever the view said; a shared cache
+  # must not replay it, and the cookie with it, to others
+  if session.modified and response.cache_control.public:
+    response.cache_control.public = False
+    response.cache_control.private = True
+  return response
+
+
+#  Cache keys
+#  ----------------------------------------------------------------
+
+def venue_key(venue_id):
+  return f"venue:{venue_id}"
+
+def artist_key(artist_id):
+  return f"artist:{artist_id}"
+
+def venue_page_keys(venue_id):
+  # every cached page a venue appears on: its own page, the listings and the pages of artists that played there
+  artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+  return [venue_key(venue_id), 'venues', 'index', 'shows'] + [artist_key(artist_id) for artist_id, in artist_ids]
+
+def touch_counterparts(entity):
+  # a venue's page lists the names and images of its artists, and the other way
+  # round; when those change, bump updated_at (the pages' version) of every
+  # venue/artist the entity shares a show with. Call before the commit.
+  state = db.inspect(entity)
+  if not any(state.attrs[name].history.has_changes() for name in ('name', 'image_link')):
+    return
+  model = type(entity)
+  counterpart = Artist if model is Venue else Venue
+  foreign_keys = {Venue: Show.venue_id, Artist: Show.artist_id}
+  counterpart_ids = db.session.query(foreign_keys[counterpart]).filter(foreign_keys[model] == entity.id)
+  db.session.execute(counterpart.__table__.update()
+    .where(counterpart.__table__.c.id.in_(counterpart_ids.subquery()))
+    .values(updated_at=datetime.utcnow()))
+
+def artist_page_keys(artist_id):
+  # every cached page an artist appears on: its own page, the listings and the pages of venues it played
+  venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+  return [artist_key(artist_id), 'artists', 'index', 'shows'] + [venue_key(venue_id) for venue_id, in venue_ids]
@@ -0,0 +1,188 @@
+from datetime import date, datetime, time, timedelta
+from flask import Blueprint, Response, current_app, request, abort, stream_with_context, url_for
+from models import db, Venue, Artist
+from queries import calendar_shows, calendar_days
+from routing import read_only
+from streaming import stream_template, buffered
+
+
+#----------------------------------------------------------------------------#
+# Calendars.
+#
+# /calendar?city=&state=&from=&to= lists the shows in a city between two
+# dates (inclusive, YYYY-MM-DD, in UTC like every show time), day by day;
+# /venues/<id>/calendar and /artists/<id>/calendar do the same for one venue
+# or artist. Each has a .ics twin for calendar apps. Ranges are capped at
+# CALENDAR_MAX_DAYS for pages and CALENDAR_ICS_MAX_DAYS for .ics files;
+# both stream, holding one cursor batch of shows at a time.
+#----------------------------------------------------------------------------#
+
+calendar_pages = Blueprint('calendars', __name__)
+
+
+def parse_date(value):
+  # raises ValueError on anything but YYYY-MM-DD
+  return date.fromisoformat(value) if value else None
+
+
+def date_range(max_days, default_days):
+  # the (first, last) days asked for; raises ValueError on bad dates, a range over max_days
+  # or one running into the last day there is (the range ends the day after `last`)
+  first = parse_date(request.args.get('from')) or datetime.utcnow().date()
+  try:
+    last = parse_date(request.args.get('to')) or first + timedelta(days=default_days - 1)
+  except OverflowError:
+    raise ValueError("the range runs past the last date")
+  if last < first or (last - first).days >= max_days:
+    raise ValueError(f"a calendar covers 1 to {max_days} days")
+  if last == date.max:
+    raise ValueError("the range runs past the last date")
+  return first, last
+
+
+def shifted(first, last, span):
+  # (first, last) moved by span, as query arguments; None past the first or last date
+  try:
+    return {'from': (first + span).isoformat(), 'to': (last + span).isoformat()}
+  except OverflowError:
+    return None
+
+
+def day_bounds(first, last):
+  # the [start, end) instants covering days first to last
+  return datetime.combine(first, time.min), datetime.combine(last + timedelta(days=1), time.min)
+
+
+def filters(scope):
+  # the calendar_shows filters and title of a calendar scope: 'city', 'venue' or 'artist'
+  if scope == 'city':
+    city = request.args.get('city', '').strip() or None
+    state = request.args.get('state', '').strip().upper() or None
+    return {"city": city, "state": state}, ", ".join(part for part in (city, state) if part) or "All cities"
+  model = Venue if scope == 'venue' else Artist
+  entity_id = request.view_args[f'{scope}_id']
+  name = db.session.query(model.name).filter(model.id == entity_id).scalar()
+  if name is None:
+    abort(404)
+  return {f"{scope}_id": entity_id}, name
+
+
+#  Pages
+#  ----------------------------------------------------------------
+
+def calendar_page(scope):
+  config = current_app.config
+  try:
+    first, last = date_range(config['CALENDAR_MAX_DAYS'], config['CALENDAR_DAYS'])
+  except ValueError:
+    abort(400)
+  criteria, title = filters(scope)
+  span = timedelta(days=(last - first).days + 1)
+  # the same query string, shifted a range back or forward; no link past the first or last date
+  args = dict(request.args.to_dict(), **request.view_args)
+  earlier, later = shifted(first, last, -span), shifted(first, last, span)
+  return stream_template('pages/calendar.html', title=title, first=first, last=last,
+    days=calendar_days(calendar_shows(*day_bounds(first, last), **criteria)),
+    earlier=earlier and url_for(request.endpoint, **dict(args, **earlier)),
+    later=later and url_for(request.endpoint, **dict(args, **later)),
+    ics=url_for(request.endpoint + '_ics', **args))
+
+@calendar_pages.route('/calendar')
+@read_only
+def city_calendar():
+  return calendar_page('city')
+
+@calendar_pages.route('/venues/<int:venue_id>/calendar')
+@read_only
+def venue_calendar(venue_id):
+  return calendar_page('venue')
+
+@calendar_pages.route('/artists/<int:artist_id>/calendar')
+@read_only
+def artist_calendar(artist_id):
+  return calendar_page('artist')
+
+
+#  iCalendar
+#  ----------------------------------------------------------------
+
+def ics_text(value):
+  # a TEXT value, escaped as RFC 5545 3.3.11 asks
+  return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def ics_time(value):
+  # show times are naive UTC
+  return value.strftime('%Y%m%dT%H%M%SZ')
+
+
+def folded(line):
+  # a content line folded at 75 octets (RFC 5545 3.1), without splitting a UTF-8 character
+  encoded = line.encode('utf-8')
+  if len(encoded) <= 75:
+    return line + '\r\n'
+  parts, start, limit = [], 0, 75
+  while start < len(encoded):
+    end = min(start + limit, len(encoded))
+    while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+      end -= 1
+    parts.append(encoded[start:end].decode('utf-8'))
+    start, limit = end, 74
+  return '\r\n '.join(parts) + '\r\n'
+
+
+def ics_lines(shows, title):
+  # one string per event; the URL is put together by hand, url_for per event costs more than the rest
+  host = request.host.split(':')[0]
+  site = request.host_url.rstrip('/')
+  stamp = ics_time(datetime.utcnow())
+  yield "".join(folded(line) for line in (
+    'BEGIN:VCALENDAR',
+    'VERSION:2.0',
+    'PRODID:-//Fyyur//Calendar//EN',
+    'CALSCALE:GREGORIAN',
+    'METHOD:PUBLISH',
+    'X-WR-CALNAME:' + ics_text(f"Fyyur: {title}"),
+  ))
+  for show in shows:
+    location = ", ".join(part for part in (show.venue_name, show.venue_address, show.venue_city, show.venue_state) if part)
+    yield "".join(folded(line) for line in (
+      'BEGIN:VEVENT',
+      f'UID:show-{show.id}@{host}',
+      f'DTSTAMP:{stamp}',
+      f'DTSTART:{ics_time(show.start_time)}',
+      f'DTEND:{ics_time(show.start_time + timedelta(minutes=show.duration_minutes))}',
+      'SUMMARY:' + ics_text(f"{show.artist_name} at {show.venue_name}"),
+      'LOCATION:' + ics_text(location),
+      f'URL:{site}/venues/{show.venue_id}',
+      'END:VEVENT',
+    ))
+  yield folded('END:VCALENDAR')
+
+
+def calendar_ics(scope):
+  config = current_app.config
+  try:
+    first, last = date_range(config['CALENDAR_ICS_MAX_DAYS'], config['CALENDAR_ICS_DAYS'])
+  except ValueError:
+    abort(400)
+  criteria, title = filters(scope)
+  shows = calendar_shows(*day_bounds(first, last), **criteria)
+  response = Response(stream_with_context(buffered(ics_lines(shows, title))), mimetype='text/calendar')
+  response.headers['Content-Disposition'] = 'attachment; filename="fyyur.ics"'
+  return response
+
+@calendar_pages.route('/calendar.ics')
+@read_only
+def city_calendar_ics():
+  return calendar_ics('city')
+
+@calendar_pages.route('/venues/<int:venue_id>/calendar.ics')
+@read_only
+def venue_calendar_ics(venue_id):
+  return calendar_ics('venue')
+
+@calendar_pages.route('/artists/<int:artist_id>/calendar.ics')
+@read_only
+def artist_calendar_ics(artist_id):
+  return calendar_ics('artist')
@@ -0,0 +1,170 @@
+from collections import Counter
+from datetime import datetime
+import click
+from flask.cli import AppGroup
+from models import db, Venue, Artist, Show, ShowArchive, ShowCounterState
+
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#
+# Venue and Artist carry upcoming_shows_count / past_shows_count so listing
+# and detail pages read them in O(1). The counts are exact as of
+# ShowCounterState.rolled_at: writes classify a show against that instant and
+# `flask counters roll-forward` (run it from cron every few minutes) moves the
+# shows that have started since then from upcoming to past. Shows moved to
+# ShowArchive (see partitions.py) stay counted as past shows.
+#----------------------------------------------------------------------------#
+
+SHOW_FOREIGN_KEYS = {
+  Venue: Show.venue_id,
+  Artist: Show.artist_id,
+}
+
+ARCHIVED_SHOW_FOREIGN_KEYS = {
+  Venue: ShowArchive.venue_id,
+  Artist: ShowArchive.artist_id,
+}
+
+
+def counter_state(lock=False, shared=False):
+  # the watermark row, created on first use. `shared` takes a FOR SHARE lock so a
+  # concurrent roll-forward can't move the watermark under a write in progress.
+  query = ShowCounterState.query
+  if lock or shared:
+    query = query.with_for_update(read=shared)
+  state = query.first()
+  if state is None:
+    state = ShowCounterState(id=1, rolled_at=datetime.utcnow())
+    db.session.add(state)
+    db.session.flush()
+  return state
+
+
+def adjust_counters(model, deltas):
+  # deltas: [(entity_id, upcoming_delta, past_delta)], applied in one executemany UPDATE;
+  # updated_at's onupdate bumps the entities' page versions too (see cache.conditional)
+  if not deltas:
+    return
+  statement = model.__table__.update() \
+    .where(model.__table__.c.id == db.bindparam('entity_id')) \
+    .values(
+      upcoming_shows_count=model.__table__.c.upcoming_shows_count + db.bindparam('upcoming'),
+      past_shows_count=model.__table__.c.past_shows_count + db.bindparam('past')
+    )
+  db.session.execute(statement, [
+    {"entity_id": entity_id, "upcoming": upcoming, "past": past}
+    for entity_id, upcoming, past in deltas
+  ])
+
+
+def record_shows(shows):
+  # count a batch of new shows, given as dicts of Show columns, in one UPDATE per model;
+  # commit with the shows. Ids are sorted so concurrent batches lock rows in the same order.
+  rolled_at = counter_state(shared=True).rolled_at
+  for model, key in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+    upcoming, past = Counter(), Counter()
+    for show in shows:
+      (upcoming if show['start_time'] > rolled_at else past)[int(show[key])] += 1
+    adjust_counters(model, [(entity_id, upcoming[entity_id], past[entity_id]) for entity_id in sorted(upcoming.keys() | past.keys())])
+
+
+def grouped_show_counts(group_by, rolled_at, *criteria):
+  # [(id, upcoming, past)] of the shows matching criteria, grouped by a Show foreign key
+  return db.session.query(
+      group_by,
+      db.func.count(Show.id).filter(Show.start_time > rolled_at),
+      db.func.count(Show.id).filter(Show.start_time <= rolled_at)
+    ).filter(*criteria) \
+    .group_by(group_by) \
+    .all()
+
+
+def grouped_archived_counts(group_by, *criteria):
+  # {id: count} of the archived shows matching criteria; every one of them is a past show
+  return dict(db.session.query(group_by, db.func.count()).filter(*criteria).group_by(group_by).all())
+
+
+def forget_shows_of(model, entity_id):
+  # call before deleting a venue/artist: its shows go with it, so take them
+  # off the counters of the artists/venues on the other side
+  state = counter_state(shared=True)
+  counterpart = Artist if model is Venue else Venue
+  counts = grouped_show_counts(SHOW_FOREIGN_KEYS[counterpart], state.rolled_at,
+    SHOW_FOREIGN_KEYS[model] == entity_id)
+  archived = grouped_archived_counts(ARCHIVED_SHOW_FOREIGN_KEYS[counterpart],
+    ARCHIVED_SHOW_FOREIGN_KEYS[model] == entity_id)
+  deltas = {other_id: [-upcoming, -past] for other_id, upcoming, past in counts}
+  for other_id, count in archived.items():
+    deltas.setdefault(other_id, [0, 0])[1] -= count
+  adjust_counters(counterpart, [(other_id, upcoming, past) for other_id, (upcoming, past) in deltas.items()])
+
+
+def roll_forward(now=None):
+  # move shows that started in (rolled_at, now] from upcoming to past
+  now = now or datetime.utcnow()
+  state = counter_state(lock=True)
+  if now <= state.rolled_at:
+    return 0
+  window = (Show.start_time > state.rolled_at, Show.start_time <= now)
+  moved = 0
+  for model in (Venue, Artist):
+    counts = db.session.query(SHOW_FOREIGN_KEYS[model], db.func.count(Show.id)) \
+      .filter(*window) \
+      .group_by(SHOW_FOREIGN_KEYS[model]) \
+      .all()
+    adjust_counters(model, [(entity_id, -count, count) for entity_id, count in counts])
+    if model is Venue:
+      moved = sum(count for _, count in counts)
+  state.rolled_at = now
+  db.session.commit()
+  return moved
+
+
+def reconcile(repair=False):
+  # compare the stored counters against the Show table as of the watermark;
+  # returns [(model name, id, stored (upcoming, past), actual (upcoming, past))]
+  state = counter_state(lock=repair)
+  drift = []
+  for model in (Venue, Artist):
+    actual = {
+      entity_id: (upcoming, past)
+      for entity_id, upcoming, past in grouped_show_counts(SHOW_FOREIGN_KEYS[model], state.rolled_at)
+    }
+    for entity_id, count in grouped_archived_counts(ARCHIVED_SHOW_FOREIGN_KEYS[model]).items():
+      upcoming, past = actual.get(entity_id, (0, 0))
+      actual[entity_id] = (upcoming, past + count)
+    stored = db.session.query(model.id, model.upcoming_shows_count, model.past_shows_count).all()
+    deltas = []
+    for entity_id, upcoming, past in stored:
+      expected = actual.get(entity_id, (0, 0))
+      if (upcoming, past) != expected:
+        drift.append((model.__name__, entity_id, (upcoming, past), expected))
+        deltas.append((entity_id, expected[0] - upcoming, expected[1] - past))
+    if repair:
+      adjust_counters(model, deltas)
+  if repair:
+    db.session.commit()
+  return drift
+
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+counters_cli = AppGroup('counters', help='Maintain the precomputed show counters.')
+
+@counters_cli.command('roll-forward')
+def roll_forward_command():
+  """Move shows that have started since the last run from upcoming to past."""
+  moved = roll_forward()
+  click.echo(f"Rolled {moved} show(s) from upcoming to past.")
+
+@counters_cli.command('reconcile')
+@click.option('--repair', is_flag=True, help='Rewrite drifted counters with the actual counts.')
+def reconcile_command(repair):
+  """Verify the show counters against the Show and ShowArchive tables."""
+  drift = reconcile(repair=repair)
+  for model_name, entity_id, stored, actual in drift:
+    click.echo(f"{model_name} {entity_id}: stored upcoming/past {stored}, actual {actual}")
+  click.echo(f"{len(drift)} drifted counter(s){' repaired' if repair and drift else ''}.")
@@ -6,8 +6,10 @@ from fabric.contrib.console import confirm
 
 def test():
     with settings(warn_only=True):
+        # route benchmarks against the baseline saved with
+        # `flask bench run --output bench-baseline.json` (see README)
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "flask bench run --baseline bench-baseline.json --output bench-results.json", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -40,7 +42,7 @@ def heroku():
 
 def heroku_test():
     local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
+        "heroku run flask bench run --seconds 1 --requests 5"
     )
 
 
@@ -1,8 +1,8 @@
 from datetime import datetime
 from typing import Optional
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL,Regexp,Optional
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL,Regexp,Optional,NumberRange
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -16,6 +16,12 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    # the venue and the artist are booked for this long from start_time
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[Optional(), NumberRange(min=1, max=24 * 60)],
+        default=120
+    )
 
 class VenueForm(Form):
     name = StringField(
@@ -239,3 +245,44 @@ class ArtistForm(Form):
             'seeking_description'
      )
 
+
+
+# Column values of the record each form describes, shared by the request
+# handlers and the bulk importer.
+
+def venue_columns(form):
+    return dict(
+        name=form.name.data,
+        city=form.city.data,
+        state=form.state.data,
+        address=form.address.data,
+        phone=form.phone.data,
+        genres=form.genres.data,
+        facebook_link=form.facebook_link.data,
+        image_link=form.image_link.data,
+        seeking_talent=form.seeking_talent.data,
+        seeking_description=form.seeking_description.data,
+        website=form.website_link.data,
+    )
+
+def artist_columns(form):
+    return dict(
+        name=form.name.data,
+        city=form.city.data,
+        state=form.state.data,
+        phone=form.phone.data,
+        genres=form.genres.data,
+        facebook_link=form.facebook_link.data,
+        image_link=form.image_link.data,
+        seeking_venue=form.seeking_venue.data,
+        seeking_description=form.seeking_description.data,
+        website=form.website_link.data,
+    )
+
+def show_columns(form):
+    return dict(
+        artist_id=form.artist_id.data,
+        venue_id=form.venue_id.data,
+        start_time=form.start_time.data,
+        duration_minutes=form.duration_minutes.data or 120,
+    )
@@ -0,0 +1,219 @@
+import csv
+import json
+import sys
+import time
+import click
+from flask.cli import with_appcontext
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ArtistForm, ShowForm, venue_columns, artist_columns, show_columns
+from models import db, Venue, Artist, Show
+from counters import record_shows
+from bookings import BookingIndex
+from cache import response_cache
+
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+# `flask import --venues v.csv --artists a.jsonl --shows s.csv` streams each
+# file row by row, validates it with the same form the web handlers use and
+# inserts the valid rows in multi-row INSERT batches. Venue and artist rows may
+# carry a `ref` column; show rows can point at those with venue_ref/artist_ref,
+# resolved through an in-memory map, or at existing rows with venue_id/artist_id.
+# A show that would double-book its venue or artist is rejected (see bookings.py).
+#----------------------------------------------------------------------------#
+
+BATCH_SIZE = 1000
+
+FALSE_VALUES = ('', '0', 'f', 'false', 'n', 'no', 'off')
+
+
+def read_rows(path):
+  # yields (line number, row dict or None if unreadable) without loading the file whole
+  with open(path, newline='', encoding='utf-8') as source:
+    if path.endswith('.csv'):
+      # line 1 is the header
+      for line_number, row in enumerate(csv.DictReader(source), start=2):
+        yield line_number, row
+    else:
+      for line_number, line in enumerate(source, start=1):
+        if not line.strip():
+          continue
+        try:
+          yield line_number, json.loads(line)
+        except ValueError:
+          yield line_number, None
+
+
+def form_data(row):
+  # a row as the form would have been posted: list values and comma-joined
+  # genres become multiple values, booleans become checkbox values
+  data = MultiDict()
+  for key, value in row.items():
+    if key == 'genres' and isinstance(value, str):
+      value = [genre.strip() for genre in value.split(',') if genre.strip()]
+    if key.startswith('seeking_') and not isinstance(value, list):
+      value = 'y' if str(value if value is not None else '').strip().lower() not in FALSE_VALUES else ''
+    for item in value if isinstance(value, list) else [value]:
+      data.add(key, item if isinstance(item, str) else str(item))
+  return data
+
+
+class ImportStats:
+
+  def __init__(self, name):
+    self.name = name
+    self.read = 0
+    self.inserted = 0
+    self.rejected = 0
+    self.started = time.perf_counter()
+
+  def report(self):
+    elapsed = time.perf_counter() - self.started
+    rate = self.read / elapsed if elapsed else 0
+    return (f"{self.name}: {self.inserted} inserted, {self.rejected} rejected of {self.read} rows "
+            f"in {elapsed:.1f}s ({rate:.0f} rows/s)")
+
+
+class Importer:
+
+  def __init__(self, batch_size=BATCH_SIZE, rejects=None):
+    self.batch_size = batch_size
+    self.rejects = rejects
+    # source ref -> database id, for show rows that use venue_ref/artist_ref
+    self.refs = {Venue: {}, Artist: {}}
+    # ids already in the database, loaded on first use
+    self.known_ids = {Venue: None, Artist: None}
+
+  def reject(self, stats, path, line_number, row, errors):
+    stats.rejected += 1
+    if self.rejects:
+      self.rejects.write(json.dumps({"file": path, "line": line_number, "row": row, "errors": errors}) + "\n")
+    else:
+      click.echo(f"{path}:{line_number}: {errors}", err=True)
+
+  def validated(self, stats, path, form_class):
+    # valid (line number, row, form) triples of a file
+    for line_number, row in read_rows(path):
+      stats.read += 1
+      if not isinstance(row, dict):
+        self.reject(stats, path, line_number, row, "not a CSV record or JSON object")
+        continue
+      form = form_class(formdata=form_data(row), meta={'csrf': False})
+      if not form.validate():
+        self.reject(stats, path, line_number, row, form.errors)
+        continue
+      yield line_number, row, form
+
+  def batches(self, items):
+    batch = []
+    for item in items:
+      batch.append(item)
+      if len(batch) >= self.batch_size:
+        yield batch
+        batch = []
+    if batch:
+      yield batch
+
+  def insert_batch(self, stats, path, batch, insert):
+    # batch: [(line number, row, values)]; commits it, or rejects it whole if the database refuses it
+    try:
+      result = insert([values for _, _, values in batch])
+      db.session.commit()
+    except Exception:
+      db.session.rollback()
+      error = str(sys.exc_info()[1]).splitlines()[0]
+      for line_number, row, _ in batch:
+        self.reject(stats, path, line_number, row, error)
+      return None
+    stats.inserted += len(batch)
+    return result
+
+  def import_entities(self, model, form_class, columns, path):
+    stats = ImportStats(model.__tablename__)
+    table = model.__table__
+    rows = ((line_number, row, columns(form)) for line_number, row, form in self.validated(stats, path, form_class))
+    for batch in self.batches(rows):
+      def insert(values):
+        # RETURNING hands back the new ids in VALUES order
+        return [entity_id for entity_id, in db.session.execute(table.insert().values(values).returning(table.c.id))]
+      ids = self.insert_batch(stats, path, batch, insert)
+      if ids is None:
+        continue
+      for (_, row, _), entity_id in zip(batch, ids):
+        if row.get('ref') not in (None, ''):
+          self.refs[model][str(row['ref'])] = entity_id
+      if self.known_ids[model] is not None:
+        self.known_ids[model].update(ids)
+    return stats
+
+  def resolve(self, model, row, prefix):
+    # database id a show row points at, or None
+    ref = row.get(f'{prefix}_ref')
+    if ref not in (None, ''):
+      return self.refs[model].get(str(ref))
+    if self.known_ids[model] is None:
+      self.known_ids[model] = {entity_id for entity_id, in db.session.query(model.id)}
+    try:
+      entity_id = int(row.get(f'{prefix}_id'))
+    except (TypeError, ValueError):
+      return None
+    return entity_id if entity_id in self.known_ids[model] else None
+
+  def resolved_shows(self, stats, path):
+    for line_number, row, form in self.validated(stats, path, ShowForm):
+      values = show_columns(form)
+      values['venue_id'] = self.resolve(Venue, row, 'venue')
+      values['artist_id'] = self.resolve(Artist, row, 'artist')
+      if values['venue_id'] is None or values['artist_id'] is None:
+        self.reject(stats, path, line_number, row, "unknown venue or artist")
+        continue
+      yield line_number, row, values
+
+  def bookable(self, stats, path, batch):
+    # the shows of a batch that clash with neither an existing booking nor an earlier
+    # show of the import; the rest are rejected before they can fail the whole batch
+    bookings = BookingIndex([values for _, _, values in batch])
+    kept = []
+    for line_number, row, values in batch:
+      taken = bookings.conflicts(values)
+      if taken:
+        self.reject(stats, path, line_number, row, f"{' and '.join(taken)} already booked at that time")
+        continue
+      bookings.add(values)
+      kept.append((line_number, row, values))
+    return kept
+
+  def import_shows(self, path):
+    stats = ImportStats(Show.__tablename__)
+    for batch in self.batches(self.resolved_shows(stats, path)):
+      batch = self.bookable(stats, path, batch)
+      if not batch:
+        continue
+      def insert(values):
+        db.session.execute(Show.__table__.insert().values(values))
+        # count the batch into the show counters in the same transaction
+        record_shows(values)
+        return True
+      self.insert_batch(stats, path, batch, insert)
+    return stats
+
+
+@click.command('import')
+@click.option('--venues', type=click.Path(exists=True, dir_okay=False), help='CSV or JSONL file of venues.')
+@click.option('--artists', type=click.Path(exists=True, dir_okay=False), help='CSV or JSONL file of artists.')
+@click.option('--shows', type=click.Path(exists=True, dir_okay=False), help='CSV or JSONL file of shows.')
+@click.option('--batch-size', default=BATCH_SIZE, show_default=True, help='Rows per INSERT transaction.')
+@click.option('--rejects', type=click.File('w'), help='Write rejected rows here as JSONL instead of to stderr.')
+@with_appcontext
+def import_command(venues, artists, shows, batch_size, rejects):
+  """Bulk import venues, artists and shows."""
+  importer = Importer(batch_size, rejects)
+  if venues:
+    click.echo(importer.import_entities(Venue, VenueForm, venue_columns, venues).report())
+  if artists:
+    click.echo(importer.import_entities(Artist, ArtistForm, artist_columns, artists).report())
+  if shows:
+    click.echo(importer.import_shows(shows).report())
+  if response_cache.backend:
+    response_cache.backend.clear()
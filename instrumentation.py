@@ -0,0 +1,225 @@
+import cProfile
+import itertools
+import os
+import reprlib
+import threading
+import time
+from collections import defaultdict
+from flask import Response, current_app, g, has_app_context, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+#----------------------------------------------------------------------------#
+# Instrumentation.
+#
+# Every request records how many SQL statements it ran, the time spent in the
+# database and rendering templates, and returns them in a Server-Timing header.
+# Totals per endpoint are served at /_metrics in the Prometheus text format.
+# Statements slower than SLOW_QUERY_THRESHOLD are logged with their
+# parameters, both shortened (a bulk insert's run to megabytes), and every PROFILE_EVERY-th request can be run under cProfile.
+#
+# A streamed response runs most of its queries and rendering while its body
+# is sent, after the request hooks: it is counted when it closes, and gets no
+# Server-Timing header, since that leaves with the headers, before the numbers
+# are known.
+#----------------------------------------------------------------------------#
+
+# longest statement text a slow statement log line shows
+SLOW_LOG_STATEMENT = 1000
+# the parameters are shown as reprlib shortens them
+slow_log_repr = reprlib.Repr()
+slow_log_repr.maxstring = slow_log_repr.maxother = 80
+slow_log_repr.maxlist = slow_log_repr.maxtuple = slow_log_repr.maxdict = 10
+
+
+def describe_parameters(parameters, executemany):
+  # a bounded description of a statement's parameters: executemany() gets
+  # a count of the parameter sets and the first of them
+  if executemany:
+    first = slow_log_repr.repr(parameters[0]) if parameters else '-'
+    return f"{len(parameters)} parameter sets, the first {first}"
+  return slow_log_repr.repr(parameters)
+
+
+class TimedTemplate(Template):
+  # adds the time spent rendering to the current request's render timer
+
+  def render(self, *args, **kwargs):
+    started = time.perf_counter()
+    try:
+      return super().render(*args, **kwargs)
+    finally:
+      if has_request_context() and hasattr(g, 'render_time'):
+        g.render_time += time.perf_counter() - started
+
+
+def timed_render(chunks):
+  # passes a streamed template's chunks through, adding the time spent producing each
+  # to the render timer (fetching the rows the template iterates over included)
+  chunks = iter(chunks)
+  while True:
+    started = time.perf_counter()
+    try:
+      chunk = next(chunks)
+    except StopIteration:
+      return
+    finally:
+      if has_request_context() and hasattr(g, 'render_time'):
+        g.render_time += time.perf_counter() - started
+    yield chunk
+
+
+class InstrumentationState:
+  # one app's totals and settings, in app.extensions['instrumentation']
+
+  def __init__(self, app):
+    self.lock = threading.Lock()
+    self.requests = itertools.count(1)
+    # (endpoint, method, status) -> count
+    self.responses = defaultdict(int)
+    # endpoint -> [statements, db seconds, render seconds, request seconds, requests]
+    self.totals = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0])
+    self.slow_statements = 0
+    self.extra_metrics = []
+    self.logger = app.logger
+    self.slow_query_threshold = app.config.get('SLOW_QUERY_THRESHOLD', 0.1)
+    self.profile_every = app.config.get('PROFILE_EVERY', 0)
+    self.profile_dir = app.config.get('PROFILE_DIR', 'profiles')
+
+
+class Instrumentation:
+
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    app.extensions['instrumentation'] = InstrumentationState(app)
+    # once, however many apps are created: listening twice would count every statement twice
+    if not event.contains(Engine, 'before_cursor_execute', self.before_cursor_execute):
+      event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+      event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+    app.jinja_env.template_class = TimedTemplate
+    app.before_request(self.before_request)
+    app.after_request(self.after_request)
+    app.add_url_rule('/_metrics', 'metrics', self.metrics)
+
+  def state(self):
+    return current_app.extensions['instrumentation']
+
+  def add_metrics(self, app, collect):
+    # collect() returns extra [(name, help, type, value)] for app's /_metrics
+    app.extensions['instrumentation'].extra_metrics.append(collect)
+
+  #  SQLAlchemy events
+  #  ----------------------------------------------------------------
+
+  def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+  def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    if has_request_context() and hasattr(g, 'sql_count'):
+      g.sql_count += 1
+      g.sql_time += elapsed
+    # slow statements are counted and logged by the app running them
+    state = current_app.extensions.get('instrumentation') if has_app_context() else None
+    if state is not None and elapsed >= state.slow_query_threshold:
+      with state.lock:
+        state.slow_statements += 1
+      if len(statement) > SLOW_LOG_STATEMENT:
+        statement = f"{statement[:SLOW_LOG_STATEMENT]}... ({len(statement)} characters)"
+      state.logger.warning('slow statement (%.1f ms): %s [%s]', elapsed * 1000, statement,
+        describe_parameters(parameters, executemany))
+
+  #  Request hooks
+  #  ----------------------------------------------------------------
+
+  def before_request(self):
+    state = self.state()
+    g.request_started = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+    g.render_time = 0.0
+    g.profiler = None
+    if state.profile_every and next(state.requests) % state.profile_every == 0:
+      g.profiler = cProfile.Profile()
+      g.profiler.enable()
+
+  def after_request(self, response):
+    if not hasattr(g, 'request_started'):
+      return response
+    state, endpoint, method = self.state(), request.endpoint or 'unknown', request.method
+    if response.is_streamed:
+      timer = g._get_current_object()
+      response.call_on_close(lambda: self.finish(state, timer, endpoint, method, response.status_code))
+      return response
+
+    elapsed = self.finish(state, g, endpoint, method, response.status_code)
+    response.headers.add('Server-Timing', ", ".join([
+      f'db;dur={g.sql_time * 1000:.1f};desc="{g.sql_count} statements"',
+      f'render;dur={g.render_time * 1000:.1f}',
+      f'total;dur={elapsed * 1000:.1f}',
+    ]))
+    return response
+
+  def finish(self, state, timer, endpoint, method, status):
+    # adds a finished request, timed in `timer` (its g), to the app's totals; returns its duration
+    elapsed = time.perf_counter() - timer.request_started
+    if timer.profiler is not None:
+      timer.profiler.disable()
+      os.makedirs(state.profile_dir, exist_ok=True)
+      timer.profiler.dump_stats(os.path.join(state.profile_dir, f"{endpoint}-{time.time():.6f}.prof"))
+
+    with state.lock:
+      state.responses[(endpoint, method, status)] += 1
+      totals = state.totals[endpoint]
+      totals[0] += timer.sql_count
+      totals[1] += timer.sql_time
+      totals[2] += timer.render_time
+      totals[3] += elapsed
+      totals[4] += 1
+    return elapsed
+
+  #  /_metrics
+  #  ----------------------------------------------------------------
+
+  def metrics(self):
+    lines = []
+
+    def metric(name, help, type, samples):
+      lines.append(f"# HELP {name} {help}")
+      lines.append(f"# TYPE {name} {type}")
+      for labels, value in samples:
+        label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    state = self.state()
+    with state.lock:
+      responses = list(state.responses.items())
+      totals = [(endpoint, list(values)) for endpoint, values in state.totals.items()]
+      slow_statements = state.slow_statements
+
+    metric('fyyur_http_responses_total', 'Responses by endpoint, method and status.', 'counter',
+      [({"endpoint": endpoint, "method": method, "status": status}, count)
+       for (endpoint, method, status), count in responses])
+    for index, (name, help) in enumerate([
+      ('fyyur_db_statements_total', 'SQL statements executed while handling requests.'),
+      ('fyyur_db_seconds_total', 'Time spent executing SQL statements.'),
+      ('fyyur_render_seconds_total', 'Time spent rendering templates.'),
+      ('fyyur_request_seconds_total', 'Time spent handling requests.'),
+      ('fyyur_requests_total', 'Requests handled.'),
+    ]):
+      metric(name, help, 'counter', [({"endpoint": endpoint}, values[index]) for endpoint, values in totals])
+    metric('fyyur_db_slow_statements_total', 'Statements slower than SLOW_QUERY_THRESHOLD.', 'counter',
+      [({}, slow_statements)])
+    for collect in state.extra_metrics:
+      for name, help, type, value in collect():
+        metric(name, help, type, [({}, value)])
+
+    return Response("\n".join(lines) + "\n", mimetype='text/plain; version=0.0.4')
+
+
+instrumentation = Instrumentation()
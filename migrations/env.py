@@ -1,4 +1,5 @@
 import logging
+import re
 from logging.config import fileConfig
 
 from flask import current_app
@@ -51,6 +52,16 @@ def get_metadata():
     return target_db.metadata
 
 
+# the monthly and default partitions of Show and ShowArchive (see partitions.py) aren't
+# in the models; autogenerate would otherwise drop them along with their indexes
+PARTITION_NAME = re.compile(r'^(Show|ShowArchive)_(default|\d{4}_\d{2})$')
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    table = object if type_ == 'table' else getattr(object, 'table', None)
+    return table is None or not PARTITION_NAME.match(table.name)
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +76,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +105,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
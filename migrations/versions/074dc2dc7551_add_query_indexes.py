@@ -0,0 +1,60 @@
+"""Add indexes for the hot query predicates.
+
+Revision ID: 074dc2dc7551
+Revises: 0b18ec088c97
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '074dc2dc7551'
+down_revision = '0b18ec088c97'
+branch_labels = None
+depends_on = None
+
+
+# (table, column) pairs searched with ilike '%term%'
+TRGM_COLUMNS = [
+    ('Venue', 'name'),
+    ('Venue', 'city'),
+    ('Venue', 'state'),
+    ('Artist', 'name'),
+    ('Artist', 'city'),
+    ('Artist', 'state'),
+]
+
+
+def upgrade():
+    # per-venue / per-artist show lookups split on start_time
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    # /shows keyset pagination
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+    # /venues grouping by area
+    op.create_index('ix_Venue_city_state', 'Venue', ['city', 'state'], unique=False)
+    # "recently listed" on the home page
+    op.create_index('ix_Venue_created_at', 'Venue', [sa.text('created_at DESC')], unique=False)
+    op.create_index('ix_Artist_created_at', 'Artist', [sa.text('created_at DESC')], unique=False)
+
+    # trigram indexes so ilike '%term%' searches don't scan the whole table
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRGM_COLUMNS:
+        op.create_index(
+            f'ix_{table}_{column}_trgm', table, [column], unique=False,
+            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'}
+        )
+
+
+def downgrade():
+    for table, column in TRGM_COLUMNS:
+        op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
+
+    op.drop_index('ix_Artist_created_at', table_name='Artist')
+    op.drop_index('ix_Venue_created_at', table_name='Venue')
+    op.drop_index('ix_Venue_city_state', table_name='Venue')
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
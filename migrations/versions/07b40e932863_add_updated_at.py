@@ -0,0 +1,31 @@
+"""Add updated_at to Venue and Artist.
+
+Revision ID: 07b40e932863
+Revises: ccfec58c3193
+Create Date: 2026-10-17 13:31:52.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '07b40e932863'
+down_revision = 'ccfec58c3193'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"""UPDATE "{table}" SET updated_at = coalesce(created_at, timezone('utc', now()))""")
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
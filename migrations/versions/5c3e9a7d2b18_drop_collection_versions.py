@@ -0,0 +1,46 @@
+"""Drop CollectionVersion and its statement triggers.
+
+Revision ID: 5c3e9a7d2b18
+Revises: f1c8a2d4b6e9
+Create Date: 2026-10-17 23:48:12.604913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c3e9a7d2b18'
+down_revision = 'f1c8a2d4b6e9'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    # every write to a table bumped its single row, so writers to the same table queued on it
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER "{table}_version" ON "{table}"')
+    op.execute('DROP FUNCTION bump_collection_version()')
+    op.drop_table('CollectionVersion')
+
+
+def downgrade():
+    op.create_table('CollectionVersion',
+        sa.Column('table_name', sa.String(length=63), nullable=False),
+        sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('table_name', name='CollectionVersion_pkey'),
+    )
+    op.execute('INSERT INTO "CollectionVersion" (table_name) VALUES ' + ', '.join(f"('{table}')" for table in TABLES))
+    op.execute("""
+CREATE FUNCTION bump_collection_version() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  UPDATE "CollectionVersion" SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+  RETURN NULL;
+END
+$$;
+""")
+    for table in TABLES:
+        op.execute(f'CREATE TRIGGER "{table}_version" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "{table}" '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION bump_collection_version()')
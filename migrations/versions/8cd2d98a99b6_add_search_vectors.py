@@ -0,0 +1,41 @@
+"""Add stored search vectors to Venue and Artist.
+
+Revision ID: 8cd2d98a99b6
+Revises: 074dc2dc7551
+Create Date: 2026-10-17 10:47:03.552917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8cd2d98a99b6'
+down_revision = '074dc2dc7551'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(state, '')), 'B')"
+)
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        # a stored generated column is filled for existing rows and kept current on every write
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(
+                'search_vector', postgresql.TSVECTOR(),
+                sa.Computed(SEARCH_VECTOR, persisted=True), nullable=True
+            ))
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('search_vector')
@@ -0,0 +1,53 @@
+"""Add precomputed show counters to Venue and Artist.
+
+Revision ID: ccfec58c3193
+Revises: 8cd2d98a99b6
+Create Date: 2026-10-17 12:05:29.140736
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ccfec58c3193'
+down_revision = '8cd2d98a99b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ShowCounterState',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('rolled_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # start_time is stored as naive UTC
+    op.execute("""INSERT INTO "ShowCounterState" (id, rolled_at) VALUES (1, timezone('utc', now()))""")
+
+    for table, foreign_key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+            batch_op.add_column(sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+        # backfill as of the watermark just written
+        op.execute(f"""
+            UPDATE "{table}" AS entity
+            SET upcoming_shows_count = counts.upcoming, past_shows_count = counts.past
+            FROM (
+                SELECT {foreign_key} AS id,
+                    count(*) FILTER (WHERE start_time > state.rolled_at) AS upcoming,
+                    count(*) FILTER (WHERE start_time <= state.rolled_at) AS past
+                FROM "Show", "ShowCounterState" AS state
+                GROUP BY {foreign_key}
+            ) AS counts
+            WHERE entity.id = counts.id
+        """)
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
+    op.drop_table('ShowCounterState')
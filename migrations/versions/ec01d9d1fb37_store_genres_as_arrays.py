@@ -0,0 +1,39 @@
+"""Store genres as indexed arrays.
+
+Revision ID: ec01d9d1fb37
+Revises: 07b40e932863
+Create Date: 2026-10-17 15:02:17.881394
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'ec01d9d1fb37'
+down_revision = '07b40e932863'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        # split the comma-joined strings into arrays in place
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('genres',
+                existing_type=sa.String(length=120),
+                type_=postgresql.ARRAY(sa.String()),
+                postgresql_using="string_to_array(nullif(genres, ''), ',')")
+        op.create_index(f'ix_{table}_genres', table, ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.drop_index(f'ix_{table}_genres', table_name=table)
+        # genres that no longer fit in 120 characters are truncated, as before
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('genres',
+                existing_type=postgresql.ARRAY(sa.String()),
+                type_=sa.String(length=120),
+                postgresql_using="left(array_to_string(genres, ','), 120)")
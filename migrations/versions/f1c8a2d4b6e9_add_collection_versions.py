@@ -0,0 +1,45 @@
+"""Add CollectionVersion, bumped by statement triggers on Venue, Artist and Show.
+
+Revision ID: f1c8a2d4b6e9
+Revises: e3a9c7b5d1f4
+Create Date: 2026-10-17 21:12:05.318224
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c8a2d4b6e9'
+down_revision = 'e3a9c7b5d1f4'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    op.create_table('CollectionVersion',
+        sa.Column('table_name', sa.String(length=63), nullable=False),
+        sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('table_name', name='CollectionVersion_pkey'),
+    )
+    op.execute('INSERT INTO "CollectionVersion" (table_name) VALUES ' + ', '.join(f"('{table}')" for table in TABLES))
+    op.execute("""
+CREATE FUNCTION bump_collection_version() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  UPDATE "CollectionVersion" SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+  RETURN NULL;
+END
+$$;
+""")
+    for table in TABLES:
+        op.execute(f'CREATE TRIGGER "{table}_version" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "{table}" '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION bump_collection_version()')
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER "{table}_version" ON "{table}"')
+    op.execute('DROP FUNCTION bump_collection_version()')
+    op.drop_table('CollectionVersion')
@@ -1,11 +1,20 @@
 import datetime
-from flask_sqlalchemy import SQLAlchemy
+from routing import RoutingSQLAlchemy
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR, TSRANGE, ExcludeConstraint
 
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
+
+def search_vector_column():
+  # tsvector over name (weight A) and city/state (weight B), recomputed by Postgres on every write
+  return db.Column(TSVECTOR, db.Computed(
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(state, '')), 'B')",
+    persisted=True
+  ))
 
 class Venue(db.Model):
   __tablename__ = 'Venue'
@@ -16,7 +25,7 @@ class Venue(db.Model):
   state = db.Column(db.String(120))
   address = db.Column(db.String(120))
   phone = db.Column(db.String(120))
-  genres = db.Column(db.String(120))
+  genres = db.Column(ARRAY(db.String))
   image_link = db.Column(db.String(500))
   facebook_link = db.Column(db.String(120))
   # TODO: implement any missing fields, as a database migration using Flask-Migrate --done
@@ -24,7 +33,24 @@ class Venue(db.Model):
   seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
   seeking_description = db.Column(db.String(500))
   created_at = db.Column(db.DateTime, default= datetime.datetime.utcnow())
+  updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+  search_vector = search_vector_column()
+  # maintained by counters.py, as of ShowCounterState.rolled_at
+  upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+  past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
   shows = db.relationship('Show',backref='venue',lazy=True,cascade="all,delete",passive_deletes=True)
+
+  __table_args__ = (
+    db.Index('ix_Venue_city_state', city, state),
+    db.Index('ix_Venue_created_at', created_at.desc()),
+    db.Index('ix_Venue_updated_at', updated_at),
+    db.Index('ix_Venue_genres', genres, postgresql_using='gin'),
+    db.Index('ix_Venue_name_trgm', name, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    db.Index('ix_Venue_city_trgm', city, postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+    db.Index('ix_Venue_state_trgm', state, postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'}),
+    db.Index('ix_Venue_search_vector', search_vector, postgresql_using='gin'),
+  )
+
   def __repr__(self):
     return f'<Venue id={self.id} name={self.name}>'
 
@@ -36,7 +62,7 @@ class Artist(db.Model):
   city = db.Column(db.String(120))
   state = db.Column(db.String(120))
   phone = db.Column(db.String(120))
-  genres = db.Column(db.String(120))
+  genres = db.Column(ARRAY(db.String))
   image_link = db.Column(db.String(500))
   facebook_link = db.Column(db.String(120))
   # TODO: --done implement any missing fields, as a database migration using Flask-Migrate
@@ -44,17 +70,118 @@ class Artist(db.Model):
   seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
   seeking_description = db.Column(db.String(500))
   created_at = db.Column(db.DateTime, default= datetime.datetime.utcnow())
+  updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+  search_vector = search_vector_column()
+  # maintained by counters.py, as of ShowCounterState.rolled_at
+  upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+  past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
   shows = db.relationship('Show',backref='artist',lazy=True,cascade="all,delete",passive_deletes=True)
+
+  __table_args__ = (
+    db.Index('ix_Artist_created_at', created_at.desc()),
+    db.Index('ix_Artist_updated_at', updated_at),
+    db.Index('ix_Artist_genres', genres, postgresql_using='gin'),
+    db.Index('ix_Artist_name_trgm', name, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    db.Index('ix_Artist_city_trgm', city, postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+    db.Index('ix_Artist_state_trgm', state, postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'}),
+    db.Index('ix_Artist_search_vector', search_vector, postgresql_using='gin'),
+  )
+
   def __repr__(self):
     return f'<Artist id={self.id} name={self.name}>'
 
+class ShowCounterState(db.Model):
+  __tablename__ = 'ShowCounterState'
+  # single row holding the instant the show counters were last rolled forward to:
+  # shows starting after rolled_at are counted as upcoming, the rest as past
+  id = db.Column(db.Integer, primary_key=True)
+  rolled_at = db.Column(db.DateTime, nullable=False)
+  def __repr__(self):
+    return f'<ShowCounterState rolled_at={self.rolled_at}>'
+
 # TODO  Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 class Show(db.Model):
   __tablename__ = "Show"
   # get info for the Show
-  id = db.Column(db.Integer, primary_key=True)
+  # partitioned by month of start_time (see partitions.py), so start_time is part of the key
+  id = db.Column(db.Integer, primary_key=True, autoincrement=True)
   artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id"), nullable=False)
   venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"), nullable=False)
-  start_time = db.Column(db.DateTime, default= datetime.datetime.utcnow())
+  start_time = db.Column(db.DateTime, primary_key=True, default= datetime.datetime.utcnow())
+  # the show holds its venue and artist for [start_time, start_time + duration), see ShowBooking
+  duration_minutes = db.Column(db.Integer, nullable=False, default=120, server_default='120')
+
+  __table_args__ = (
+    db.Index('ix_Show_venue_id_start_time', venue_id, start_time),
+    db.Index('ix_Show_artist_id_start_time', artist_id, start_time),
+    db.Index('ix_Show_start_time_id', start_time, id),
+    {'postgresql_partition_by': 'RANGE (start_time)'},
+  )
+
   def __repr__(self):
-    return f"<Show id={self.id} artist_id={self.artist_id} venue_id={self.venue_id} start_time={self.start_time}"
\ No newline at end of file
+    return f"<Show id={self.id} artist_id={self.artist_id} venue_id={self.venue_id} start_time={self.start_time}"
+class ShowArchive(db.Model):
+  __tablename__ = "ShowArchive"
+  # the monthly Show partitions moved out by `flask partitions archive`, kept as they
+  # were; not listed on any page, but counted as past shows
+  id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+  artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id"), nullable=False)
+  venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"), nullable=False)
+  start_time = db.Column(db.DateTime, primary_key=True)
+  duration_minutes = db.Column(db.Integer, nullable=False, default=120, server_default='120')
+
+  __table_args__ = (
+    # the same indexes as Show, so its partitions attach without building new ones
+    db.Index('ix_ShowArchive_venue_id_start_time', venue_id, start_time),
+    db.Index('ix_ShowArchive_artist_id_start_time', artist_id, start_time),
+    db.Index('ix_ShowArchive_start_time_id', start_time, id),
+    {'postgresql_partition_by': 'RANGE (start_time)'},
+  )
+
+  def __repr__(self):
+    return f"<ShowArchive id={self.id} artist_id={self.artist_id} venue_id={self.venue_id} start_time={self.start_time}>"
+
+# a partitioned table takes no rows until it has a partition for them
+db.event.listen(Show.__table__, 'after_create', db.DDL('CREATE TABLE "Show_default" PARTITION OF "Show" DEFAULT'))
+
+def slot(entity_id):
+  # int4range(id, id, '[]'): two slots overlap exactly when the ids are equal, which lets an
+  # id take part in a GiST exclusion constraint without the btree_gist extension
+  return db.func.int4range(entity_id, entity_id, db.literal_column("'[]'"))
+
+class ShowBooking(db.Model):
+  __tablename__ = "ShowBooking"
+  # the time each show in Show holds its venue and artist, written by the Show_booking
+  # trigger below. Postgres can't enforce an exclusion constraint across the partitions
+  # of Show, so the constraints that keep a venue or an artist from being booked twice
+  # at once live on this table instead (see bookings.py).
+  show_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+  venue_id = db.Column(db.Integer, nullable=False)
+  artist_id = db.Column(db.Integer, nullable=False)
+  # naive UTC like start_time, hence tsrange rather than tstzrange
+  during = db.Column(TSRANGE, nullable=False)
+
+  __table_args__ = (
+    ExcludeConstraint((slot(db.column('venue_id')), '&&'), (during, '&&'), name='ShowBooking_venue_excl', using='gist'),
+    ExcludeConstraint((slot(db.column('artist_id')), '&&'), (during, '&&'), name='ShowBooking_artist_excl', using='gist'),
+  )
+
+  def __repr__(self):
+    return f"<ShowBooking show_id={self.show_id} venue_id={self.venue_id} artist_id={self.artist_id} during={self.during}>"
+
+# keeps ShowBooking in step with every write to Show, whichever code path makes it
+db.event.listen(Show.__table__, 'after_create', db.DDL("""
+CREATE FUNCTION show_booking() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    DELETE FROM "ShowBooking" WHERE show_id = OLD.id;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO "ShowBooking" (show_id, venue_id, artist_id, during)
+    VALUES (NEW.id, NEW.venue_id, NEW.artist_id, tsrange(NEW.start_time, NEW.start_time + make_interval(mins => NEW.duration_minutes)));
+  END IF;
+  RETURN NULL;
+END
+$$;
+CREATE TRIGGER "Show_booking" AFTER INSERT OR UPDATE OR DELETE ON "Show" FOR EACH ROW EXECUTE FUNCTION show_booking();
+"""))
@@ -0,0 +1,149 @@
+from datetime import datetime
+import click
+from flask.cli import AppGroup
+from models import db, Venue, Artist, Show
+from cache import response_cache
+
+
+#----------------------------------------------------------------------------#
+# Show partitions.
+#
+# Show is range partitioned by start_time, one partition per month
+# ("Show_2026_10"), plus "Show_default" for rows no month partition takes.
+# Queries filtered on start_time (the upcoming and past halves of the detail
+# pages, the /shows cursor) only scan the months they need.
+#
+# `flask partitions ensure` (run it daily from cron) creates the partitions
+# for the coming months and for any month whose rows went to the default
+# partition. `flask partitions archive` detaches the months older than
+# --keep-months and attaches them to ShowArchive as they are, without
+# copying rows: archived shows leave the pages' show lists but stay counted
+# as past shows (see counters.py).
+#----------------------------------------------------------------------------#
+
+DEFAULT_PARTITION = 'Show_default'
+MONTHS_AHEAD = 12
+KEEP_MONTHS = 24
+
+
+def month_start(value):
+  return datetime(value.year, value.month, 1)
+
+def add_months(month, count):
+  years, month_index = divmod(month.month - 1 + count, 12)
+  return datetime(month.year + years, month_index + 1, 1)
+
+def partition_name(table, month):
+  return f"{table}_{month:%Y_%m}"
+
+def bounds(month):
+  return f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+
+
+def monthly_partitions(table):
+  # {month: partition name} of a partitioned table, the default partition left out
+  names = db.session.execute(
+    "SELECT child.relname FROM pg_inherits "
+    "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+    "WHERE pg_inherits.inhparent = CAST(:parent AS regclass)", {'parent': f'"{table}"'})
+  partitions = {}
+  for name, in names:
+    try:
+      partitions[datetime.strptime(name[len(table) + 1:], '%Y_%m')] = name
+    except ValueError:
+      continue
+  return partitions
+
+
+def create_partition(month):
+  # attaches the month's partition, taking over the rows of that month from the default partition
+  name = partition_name('Show', month)
+  columns = ", ".join(column.name for column in Show.__table__.columns)
+  db.session.execute(f'CREATE TABLE "{name}" (LIKE "Show" INCLUDING DEFAULTS)')
+  db.session.execute(
+    f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE start_time >= :lower AND start_time < :upper '
+    f'RETURNING {columns}) '
+    f'INSERT INTO "{name}" ({columns}) SELECT {columns} FROM moved',
+    {'lower': month, 'upper': add_months(month, 1)})
+  db.session.execute(f'ALTER TABLE "Show" ATTACH PARTITION "{name}" {bounds(month)}')
+  # the DELETE above took the moved shows' bookings with it (see models.ShowBooking)
+  db.session.execute(
+    f'INSERT INTO "ShowBooking" (show_id, venue_id, artist_id, during) '
+    f'SELECT id, venue_id, artist_id, tsrange(start_time, start_time + make_interval(mins => duration_minutes)) FROM "{name}"')
+  return name
+
+
+def ensure_partitions(months_ahead=MONTHS_AHEAD, now=None):
+  # creates the partitions of this month and the next months_ahead, and of any month
+  # found in the default partition; returns their names
+  current = month_start(now or datetime.utcnow())
+  wanted = {add_months(current, count) for count in range(months_ahead + 1)}
+  stray = {month for month, in db.session.execute(
+    f'SELECT DISTINCT date_trunc(\'month\', start_time) FROM "{DEFAULT_PARTITION}"')}
+  # a month that was archived stays archived; late rows for it stay in the default partition
+  taken = set(monthly_partitions('Show')) | set(monthly_partitions('ShowArchive'))
+  created = [create_partition(month) for month in sorted((wanted | stray) - taken)]
+  db.session.commit()
+  return created
+
+
+def archive_partitions(keep_months=KEEP_MONTHS, now=None):
+  # moves the months that ended more than keep_months ago from Show to ShowArchive; returns their names
+  cutoff = add_months(month_start(now or datetime.utcnow()), -keep_months)
+  archived = []
+  for month, name in sorted(monthly_partitions('Show').items()):
+    if add_months(month, 1) > cutoff:
+      continue
+    # these shows drop off their venues' and artists' pages and the API's /shows, whose
+    # version reads updated_at (see queries.collection_version)
+    for model, foreign_key in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+      db.session.execute(
+        f'UPDATE "{model.__tablename__}" SET updated_at = :now WHERE id IN (SELECT {foreign_key} FROM "{name}")',
+        {'now': datetime.utcnow()})
+    # past shows hold no bookings worth checking against, and a detach doesn't delete them
+    db.session.execute(f'DELETE FROM "ShowBooking" WHERE show_id IN (SELECT id FROM "{name}")')
+    archive_name = partition_name('ShowArchive', month)
+    db.session.execute(f'ALTER TABLE "Show" DETACH PARTITION "{name}"')
+    db.session.execute(f'ALTER TABLE "{name}" RENAME TO "{archive_name}"')
+    db.session.execute(f'ALTER TABLE "ShowArchive" ATTACH PARTITION "{archive_name}" {bounds(month)}')
+    archived.append(archive_name)
+  db.session.commit()
+  if archived and response_cache.backend:
+    response_cache.backend.clear()
+  return archived
+
+
+def partition_sizes(table):
+  # [(partition name, estimated rows, bytes)] of a partitioned table
+  return db.session.execute(
+    "SELECT child.relname, greatest(child.reltuples, 0)::bigint, pg_total_relation_size(child.oid) FROM pg_inherits "
+    "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+    "WHERE pg_inherits.inhparent = CAST(:parent AS regclass) ORDER BY child.relname", {'parent': f'"{table}"'}).fetchall()
+
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+partitions_cli = AppGroup('partitions', help='Maintain the monthly Show partitions.')
+
+@partitions_cli.command('ensure')
+@click.option('--months-ahead', default=MONTHS_AHEAD, show_default=True, help='Create partitions this many months ahead.')
+def ensure_command(months_ahead):
+  """Create the partitions for the coming months."""
+  created = ensure_partitions(months_ahead)
+  click.echo(f"Created {len(created)} partition(s){': ' + ', '.join(created) if created else ''}.")
+
+@partitions_cli.command('archive')
+@click.option('--keep-months', default=KEEP_MONTHS, show_default=True, help='Keep shows of this many past months in Show.')
+def archive_command(keep_months):
+  """Move the partitions of old months to ShowArchive."""
+  archived = archive_partitions(keep_months)
+  click.echo(f"Archived {len(archived)} partition(s){': ' + ', '.join(archived) if archived else ''}.")
+
+@partitions_cli.command('status')
+def status_command():
+  """List the partitions of Show and ShowArchive."""
+  for table in ('Show', 'ShowArchive'):
+    for name, rows, size in partition_sizes(table):
+      click.echo(f"{name:<24}{rows:>12} rows{size / 2**20:>10.1f} MB")
@@ -0,0 +1,385 @@
+from collections import namedtuple
+from datetime import datetime
+from itertools import groupby
+from models import db, Venue, Artist, Show
+
+
+#----------------------------------------------------------------------------#
+# Read models.
+#
+# List and search views get named tuples filled straight from column
+# projections: no ORM identity map or instance state and no dict per row.
+#----------------------------------------------------------------------------#
+
+Listing = namedtuple('Listing', ['id', 'name'])
+VenueListing = namedtuple('VenueListing', ['id', 'name', 'num_upcoming_shows'])
+Area = namedtuple('Area', ['city', 'state', 'venues'])
+ShowListing = namedtuple('ShowListing', ['id', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link', 'start_time'])
+SearchResult = namedtuple('SearchResult', ['id', 'name', 'num_upcoming_shows'])
+
+
+def read(read_model, rows):
+  # rows of a column projection, whose columns are in read_model's field order
+  return [read_model._make(row) for row in rows]
+
+
+#----------------------------------------------------------------------------#
+# Aggregated queries.
+#----------------------------------------------------------------------------#
+
+def with_genre(query, model, genre):
+  # genres @> ARRAY[genre], answered from the GIN index on genres
+  if genre:
+    query = query.filter(model.genres.contains([genre]))
+  return query
+
+
+def venue_areas(genre=None):
+  # one statement returning every venue with its precomputed upcoming show count,
+  # ordered so that consecutive rows share the same (city, state) area
+  query = db.session.query(
+      Venue.city,
+      Venue.state,
+      Venue.id,
+      Venue.name,
+      Venue.upcoming_shows_count
+    )
+  rows = stream_rows(with_genre(query, Venue, genre) \
+    .order_by(Venue.city, Venue.state, Venue.name, Venue.id))
+
+  # fold the flat rows into areas lazily, as they stream in: each area's venues
+  # iterate over its run of rows, so areas have to be consumed in order
+  for (city, state), area_rows in groupby(rows, key=lambda row: (row.city, row.state)):
+    yield Area(city, state, (VenueListing(row.id, row.name, row.upcoming_shows_count) for row in area_rows))
+
+
+def artist_list(genre=None):
+  # lazily, one server-side cursor batch at a time
+  return map(Listing._make, stream_rows(with_genre(db.session.query(Artist.id, Artist.name), Artist, genre)))
+
+
+RECENT_LIMIT = 10
+
+def recently_listed(model, limit=RECENT_LIMIT):
+  # newest venues or artists first, from the created_at index
+  return db.session.query(model.id, model.name).order_by(db.desc(model.created_at)).limit(limit)
+
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+SHOWS_PAGE_SIZE = 30
+
+def encode_cursor(start_time, show_id):
+  # a cursor is the (start_time, id) sort key of a show, e.g. 2024-07-07T20:00:00_42
+  return f"{start_time.isoformat()}_{show_id}"
+
+
+def decode_cursor(cursor):
+  # raises ValueError on a malformed cursor
+  start_time, show_id = cursor.rsplit("_", 1)
+  return datetime.fromisoformat(start_time), int(show_id)
+
+
+def shows_page(after=None, before=None, genre=None, limit=SHOWS_PAGE_SIZE):
+  # one page of shows with venue and artist columns joined in, ordered by (start_time, id).
+  # `after`/`before` are cursors from a previous page; the sort key comparison lets the
+  # database seek straight to the page instead of skipping over OFFSET rows.
+  query = db.session.query(
+      Show.id,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link'),
+      Show.start_time
+    ).join(Venue, Show.venue_id == Venue.id) \
+    .join(Artist, Show.artist_id == Artist.id)
+  # a show's genres are its artist's
+  query = with_genre(query, Artist, genre)
+
+  sort_key = db.tuple_(Show.start_time, Show.id)
+  if before:
+    # walk backwards from the cursor, then flip the rows back into ascending order
+    query = query.filter(sort_key < db.tuple_(*decode_cursor(before))) \
+      .order_by(Show.start_time.desc(), Show.id.desc())
+  else:
+    if after:
+      query = query.filter(sort_key > db.tuple_(*decode_cursor(after)))
+    query = query.order_by(Show.start_time, Show.id)
+
+  # fetch one extra row to find out whether there is another page in this direction
+  rows = read(ShowListing, query.limit(limit + 1))
+  has_more = len(rows) > limit
+  rows = rows[:limit]
+  if before:
+    rows.reverse()
+
+  first, last = (rows[0], rows[-1]) if rows else (None, None)
+  has_next = has_more if not before else True
+  has_prev = has_more if before else bool(after)
+  return {
+    "rows": rows,
+    "next_cursor": encode_cursor(last.start_time, last.id) if last and has_next else None,
+    "prev_cursor": encode_cursor(first.start_time, first.id) if first and has_prev else None
+  }
+
+
+#----------------------------------------------------------------------------#
+# Bulk iteration.
+#----------------------------------------------------------------------------#
+
+# rows fetched per round trip from the server-side cursor
+STREAM_BATCH_SIZE = 1000
+
+def stream_rows(query):
+  # iterate a column projection through a server-side cursor, holding one batch in memory
+  return query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+
+
+def iter_venues():
+  return stream_rows(db.session.query(
+      Venue.id,
+      Venue.name,
+      Venue.city,
+      Venue.state,
+      Venue.address,
+      Venue.phone,
+      Venue.genres,
+      Venue.website,
+      Venue.image_link,
+      Venue.facebook_link,
+      Venue.seeking_talent,
+      Venue.seeking_description,
+      Venue.upcoming_shows_count,
+      Venue.past_shows_count
+    ).order_by(Venue.id))
+
+
+def iter_artists():
+  return stream_rows(db.session.query(
+      Artist.id,
+      Artist.name,
+      Artist.city,
+      Artist.state,
+      Artist.phone,
+      Artist.genres,
+      Artist.website,
+      Artist.image_link,
+      Artist.facebook_link,
+      Artist.seeking_venue,
+      Artist.seeking_description,
+      Artist.upcoming_shows_count,
+      Artist.past_shows_count
+    ).order_by(Artist.id))
+
+
+def iter_shows():
+  return stream_rows(db.session.query(
+      Show.id,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link'),
+      Show.start_time
+    ).join(Venue, Show.venue_id == Venue.id) \
+    .join(Artist, Show.artist_id == Artist.id) \
+    .order_by(Show.start_time, Show.id))
+
+
+# the tables a collection's rows are read from: shows carry their venue's and artist's names
+COLLECTION_TABLES = {
+  Venue: (Venue,),
+  Artist: (Artist,),
+  Show: (Show, Venue, Artist),
+}
+
+def table_version(model):
+  # scalar subqueries that change with every write to the table, each an index lookup:
+  # for Venue and Artist the row count (deletes) and the latest updated_at (inserts and
+  # updates); for Show the highest id, since shows are only inserted (a venue with shows
+  # can't be deleted) and archived, which bumps their venues' and artists' updated_at
+  if model is Show:
+    return [db.session.query(db.func.max(Show.id)).as_scalar()]
+  return [db.session.query(db.func.count(model.id)).as_scalar(),
+    db.session.query(db.func.max(model.updated_at)).as_scalar()]
+
+
+def collection_version(model):
+  # changes with every write to the tables the collection is read from; one statement that
+  # reads the tables' own indexes, so writers never wait on a shared version row
+  columns = [column for table in COLLECTION_TABLES[model] for column in table_version(table)]
+  return "-".join(str(value) for value in db.session.query(*columns).one())
+
+
+def entity_version(model, entity_id, now):
+  # (updated_at, start of the latest show that has begun, start of the next one) of a
+  # venue/artist, or None if there is no such row. Its page changes when any of them
+  # does: writes bump updated_at, and a show starting moves it from upcoming to past.
+  # One statement; each show lookup is a probe of the (entity_id, start_time) index.
+  foreign_key = Show.venue_id if model is Venue else Show.artist_id
+  last_start = db.session.query(db.func.max(Show.start_time)) \
+    .filter(foreign_key == model.id, Show.start_time <= now) \
+    .correlate(model).as_scalar()
+  next_start = db.session.query(db.func.min(Show.start_time)) \
+    .filter(foreign_key == model.id, Show.start_time > now) \
+    .correlate(model).as_scalar()
+  return db.session.query(model.updated_at, last_start, next_start).filter(model.id == entity_id).first()
+
+
+#----------------------------------------------------------------------------#
+# Calendars.
+#
+# The shows starting in a bounded [start, end) range, for a city, a venue or
+# an artist: a range scan of the (venue_id, start_time) or (artist_id,
+# start_time) index, per venue of the city for a city, over only the monthly
+# partitions the range covers. Rows stream from a server-side cursor and are
+# folded into days as they arrive.
+#----------------------------------------------------------------------------#
+
+CalendarShow = namedtuple('CalendarShow', ['id', 'start_time', 'duration_minutes', 'venue_id', 'venue_name', 'venue_address',
+  'venue_city', 'venue_state', 'artist_id', 'artist_name', 'artist_image_link'])
+Day = namedtuple('Day', ['date', 'shows'])
+
+
+def calendar_shows(start, end, city=None, state=None, venue_id=None, artist_id=None):
+  # lazily, ordered by (start_time, id)
+  query = db.session.query(
+      Show.id,
+      Show.start_time,
+      Show.duration_minutes,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Venue.address.label('venue_address'),
+      Venue.city.label('venue_city'),
+      Venue.state.label('venue_state'),
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link')
+    ).join(Venue, Show.venue_id == Venue.id) \
+    .join(Artist, Show.artist_id == Artist.id) \
+    .filter(Show.start_time >= start, Show.start_time < end)
+  for column, value in ((Venue.city, city), (Venue.state, state), (Show.venue_id, venue_id), (Show.artist_id, artist_id)):
+    if value is not None:
+      query = query.filter(column == value)
+  return map(CalendarShow._make, stream_rows(query.order_by(Show.start_time, Show.id)))
+
+
+def calendar_days(shows):
+  # fold shows ordered by start_time into days, lazily like venue_areas: each day's shows
+  # iterate over its run of rows, so days have to be consumed in order
+  for date, day_shows in groupby(shows, key=lambda show: show.start_time.date()):
+    yield Day(date, day_shows)
+
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#
+# Two statements per page: the entity itself, then its shows with the other
+# side's name and image joined in. Each section is capped at
+# DETAIL_SHOWS_LIMIT: the soonest upcoming and the most recent past shows.
+#----------------------------------------------------------------------------#
+
+DETAIL_SHOWS_LIMIT = 30
+
+def split_shows_query(query, now, limit):
+  # one UNION ALL whose halves are each an index range scan on (entity_id, start_time):
+  # the soonest `limit` upcoming shows and the latest `limit` past ones
+  upcoming = query.filter(Show.start_time > now).order_by(Show.start_time, Show.id).limit(limit)
+  past = query.filter(Show.start_time <= now).order_by(Show.start_time.desc(), Show.id.desc()).limit(limit)
+  return upcoming.union_all(past)
+
+
+def split_rows(rows, now):
+  # (upcoming, past) rows; both halves were cut at the same instant, so sort them apart
+  # in Python, UNION ALL doesn't promise to keep each half's order
+  rows = sorted(rows, key=lambda row: (row.start_time, row.id))
+  return [row for row in rows if row.start_time > now], [row for row in reversed(rows) if row.start_time <= now]
+
+
+def split_shows(query, now, limit):
+  # (upcoming, past) rows of a show projection
+  return split_rows(split_shows_query(query, now, limit).all(), now)
+
+
+def venue_shows(venue_id):
+  return db.session.query(
+      Show.id,
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link'),
+      Show.start_time
+    ).join(Artist, Show.artist_id == Artist.id) \
+    .filter(Show.venue_id == venue_id)
+
+
+def artist_shows(artist_id):
+  return db.session.query(
+      Show.id,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Venue.image_link.label('venue_image_link'),
+      Show.start_time
+    ).join(Venue, Show.venue_id == Venue.id) \
+    .filter(Show.artist_id == artist_id)
+
+
+def venue_fields(venue, upcoming_shows, past_shows):
+  # prepare data object for venue
+  return {
+    "id": venue.id,
+    "name": venue.name,
+    "genres": venue.genres,
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link,
+    "past_shows": [row._asdict() for row in past_shows],
+    "upcoming_shows": [row._asdict() for row in upcoming_shows],
+    "past_shows_count": venue.past_shows_count,
+    "upcoming_shows_count": venue.upcoming_shows_count,
+  }
+
+
+def artist_fields(artist, upcoming_shows, past_shows):
+  # prepare data object for artist
+  return {
+    "id": artist.id,
+    "name": artist.name,
+    "genres": artist.genres,
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link,
+    "past_shows": [row._asdict() for row in past_shows],
+    "upcoming_shows": [row._asdict() for row in upcoming_shows],
+    "past_shows_count": artist.past_shows_count,
+    "upcoming_shows_count": artist.upcoming_shows_count,
+  }
+
+
+def venue_detail(venue_id, limit=DETAIL_SHOWS_LIMIT):
+  # venue fields plus its past and upcoming shows, or None if there is no such venue
+  venue = Venue.query.get(venue_id)
+  if venue is None:
+    return None
+  return venue_fields(venue, *split_shows(venue_shows(venue_id), datetime.utcnow(), limit))
+
+
+def artist_detail(artist_id, limit=DETAIL_SHOWS_LIMIT):
+  # artist fields plus its past and upcoming shows, or None if there is no such artist
+  artist = Artist.query.get(artist_id)
+  if artist is None:
+    return None
+  return artist_fields(artist, *split_shows(artist_shows(artist_id), datetime.utcnow(), limit))
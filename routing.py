@@ -0,0 +1,77 @@
+import random
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+
+
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#
+# Views decorated with @read_only run their queries on one of the replica
+# binds (REPLICA_DATABASE_URLS), picked per request; everything else, and any
+# flush, stays on the primary. A client that has just written something is
+# kept on the primary for REPLICA_STICKY_SECONDS so the page it is redirected
+# to shows its own write even if the replicas lag behind.
+#----------------------------------------------------------------------------#
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_binds(app):
+  return [bind for bind in (app.config.get('SQLALCHEMY_BINDS') or {}) if bind.startswith(REPLICA_BIND_PREFIX)]
+
+
+class RoutingSession(SignallingSession):
+
+  def __init__(self, db, **options):
+    self.db = db
+    super().__init__(db, **options)
+
+  def get_bind(self, mapper=None, clause=None):
+    if not self._flushing and has_app_context() and g.get('read_replica'):
+      return self.db.get_engine(self.app, bind=g.read_replica)
+    return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+  def init_app(self, app):
+    super().init_app(app)
+    app.after_request(remember_write)
+
+
+def remember_write(response):
+  # a successful write pins this client to the primary for a while
+  if request.method not in READ_METHODS and response.status_code < 400 and \
+      replica_binds(current_app) and current_app.config.get('REPLICA_STICKY_SECONDS'):
+    session['_wrote_at'] = time.time()
+  return response
+
+
+def recently_wrote():
+  wrote_at = session.get('_wrote_at')
+  return wrote_at is not None and time.time() - wrote_at < current_app.config.get('REPLICA_STICKY_SECONDS', 0)
+
+
+def read_bind():
+  # the replica bind the current request may read from, or None for the primary
+  binds = replica_binds(current_app)
+  if request.method in READ_METHODS and binds and not recently_wrote():
+    return random.choice(binds)
+  return None
+
+
+def read_only(view):
+  # route a GET view's queries to a replica
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    g.read_replica = read_bind()
+    return view(*args, **kwargs)
+  return wrapper
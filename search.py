@@ -0,0 +1,206 @@
+import re
+import weakref
+from flask import current_app
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.dml import Insert, Update, Delete
+from sqlalchemy.sql.elements import TextClause
+from models import db, Venue, Artist
+from queries import SearchResult
+
+
+#----------------------------------------------------------------------------#
+# Search.
+#
+# Venues and artists carry a stored `search_vector` (name weighted A, city and
+# state weighted B) that Postgres keeps up to date on every write. A search
+# matches prefixes of every term against it, falls back to trigram similarity
+# on the name for typos and partial words, and ranks the matches. Upcoming show
+# counts come from the precomputed counters (see counters.py).
+#----------------------------------------------------------------------------#
+
+SEARCH_CONFIG = 'simple'
+# same default as pg_trgm.similarity_threshold
+TRIGRAM_THRESHOLD = 0.3
+# ts_rank's default weights for A and B labelled lexemes
+NAME_WEIGHT = 1.0
+LOCATION_WEIGHT = 0.4
+
+
+def search_terms(search_term):
+  # lowercased words of the search term, punctuation stripped
+  return re.findall(r"\w+", search_term.lower())
+
+
+def trigrams(text):
+  # the trigram set pg_trgm builds: each word padded with two spaces in front and one behind
+  grams = set()
+  for word in re.findall(r"\w+", (text or "").lower()):
+    padded = f"  {word} "
+    grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+  return grams
+
+
+def similarity(left, right):
+  # pg_trgm similarity(): shared trigrams over all distinct trigrams
+  left, right = trigrams(left), trigrams(right)
+  if not left or not right:
+    return 0.0
+  return len(left & right) / len(left | right)
+
+
+class PostgresSearchBackend:
+  # serves searches from the stored tsvector and trigram indexes
+
+  def search(self, model, search_term, limit, now=None):
+    terms = search_terms(search_term)
+
+    # with no terms (an empty or all-punctuation search) everything matches, by name;
+    # a constant rank can't go in the ORDER BY, Postgres rejects it
+    order_by = [model.name, model.id]
+    match = db.true()
+    if terms:
+      # every term has to match, each as a prefix ("hop" finds "hopscotch")
+      tsquery = db.func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms))
+      rank = db.func.ts_rank(model.search_vector, tsquery) + db.func.similarity(model.name, search_term)
+      order_by.insert(0, rank.desc())
+      match = db.or_(
+        model.search_vector.op('@@')(tsquery),
+        model.name.ilike(f"%{search_term}%"),
+        # pg_trgm's `%` similarity operator, doubled for the pyformat paramstyle
+        model.name.op('%%')(search_term)
+      )
+
+    rows = db.session.query(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows'),
+        db.func.count().over().label('total')
+      ).filter(match) \
+      .order_by(*order_by) \
+      .limit(limit) \
+      .all()
+
+    return {
+      "count": rows[0].total if rows else 0,
+      "data": [SearchResult(row.id, row.name, row.num_upcoming_shows) for row in rows]
+    }
+
+
+class MemorySearchBackend:
+  # a pure-Python stand-in for PostgresSearchBackend, ranking the same way, for tests
+  # and development only. It is filled from plain (id, name, city, state,
+  # upcoming_shows_count) rows: given ones, which need no database, or else every
+  # venue and artist read on the first search and again after any write to them.
+  # Upcoming show counts are the same counters PostgresSearchBackend reads.
+
+  def __init__(self, venues=None, artists=None):
+    self.documents = {Venue: {}, Artist: {}}
+    self.from_database = venues is None and artists is None
+    self.stale = self.from_database
+    if self.from_database:
+      memory_backends.add(self)
+      if not db.event.contains(Engine, 'after_execute', mark_stale):
+        db.event.listen(Engine, 'after_execute', mark_stale)
+    else:
+      self.fill(Venue, venues or [])
+      self.fill(Artist, artists or [])
+
+  def fill(self, model, rows):
+    documents = {}
+    for entity_id, name, city, state, upcoming_shows_count in rows:
+      documents[entity_id] = {
+        "id": entity_id,
+        "name": name,
+        "name_words": search_terms(name or ""),
+        "location_words": search_terms(f"{city or ''} {state or ''}"),
+        "num_upcoming_shows": upcoming_shows_count or 0,
+      }
+    self.documents[model] = documents
+
+  def load(self):
+    # cleared first, so a write while loading leaves it stale
+    self.stale = False
+    for model in (Venue, Artist):
+      self.fill(model, db.session.query(model.id, model.name, model.city, model.state, model.upcoming_shows_count))
+
+  def _rank(self, document, terms, search_term):
+    # None when the document doesn't match, otherwise its relevance
+    def matches(term, words):
+      return any(word.startswith(term) for word in words)
+
+    words = document["name_words"] + document["location_words"]
+    name_similarity = similarity(document["name"], search_term)
+    if all(matches(term, words) for term in terms):
+      rank = sum(NAME_WEIGHT if matches(term, document["name_words"]) else LOCATION_WEIGHT for term in terms)
+      return rank / len(terms) + name_similarity
+    if search_term.lower() in (document["name"] or "").lower() or name_similarity >= TRIGRAM_THRESHOLD:
+      return name_similarity
+    return None
+
+  def search(self, model, search_term, limit, now=None):
+    if self.stale:
+      self.load()
+    terms = search_terms(search_term)
+
+    matches = []
+    for document in self.documents[model].values():
+      rank = self._rank(document, terms, search_term) if terms else 0.0
+      if rank is not None:
+        matches.append((-rank, document["name"] or "", document["id"]))
+    matches.sort()
+
+    data = [SearchResult(entity_id, name, self.documents[model][entity_id]["num_upcoming_shows"])
+            for _, name, entity_id in matches[:limit]]
+    return {"count": len(matches), "data": data}
+
+
+# every MemorySearchBackend filled from the database, for mark_stale()
+memory_backends = weakref.WeakSet()
+
+# a show write changes its venue's and artist's counters, so these cover it
+SEARCHED_TABLES = {Venue.__tablename__, Artist.__tablename__}
+# raw SQL statements that can write
+WRITES = ('INSERT', 'UPDATE', 'DELETE', 'TRUNCATE', 'WITH', 'ALTER')
+
+def mark_stale(conn, clauseelement, multiparams, params, *args):
+  # after each statement: a write to a searched table, through the ORM, Core (flask import,
+  # bench seed, the counters) or raw SQL, makes the memory indexes filled from it stale
+  if isinstance(clauseelement, (Insert, Update, Delete)):
+    written = clauseelement.table.name in SEARCHED_TABLES
+  elif isinstance(clauseelement, (str, TextClause)):
+    text = str(clauseelement).lstrip().upper()
+    written = text.startswith(WRITES) and any(f'"{table.upper()}' in text for table in SEARCHED_TABLES)
+  else:
+    written = False
+  if written:
+    for backend in memory_backends:
+      backend.stale = True
+
+
+class SearchEngine:
+  # picks the backend from config['SEARCH_BACKEND'] ('postgres' or 'memory'); each
+  # app's is in app.extensions['search']
+
+  backends = {
+    'postgres': PostgresSearchBackend,
+    'memory': MemorySearchBackend,
+  }
+
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    app.extensions['search'] = self.backends[app.config.get('SEARCH_BACKEND', 'postgres')]()
+
+  def search(self, model, search_term):
+    return current_app.extensions['search'].search(model, search_term, current_app.config.get('SEARCH_RESULT_LIMIT', 50))
+
+  def venues(self, search_term):
+    return self.search(Venue, search_term)
+
+  def artists(self, search_term):
+    return self.search(Artist, search_term)
+
+
+search = SearchEngine()
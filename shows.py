@@ -0,0 +1,64 @@
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort
+from queries import shows_page
+from cache import response_cache
+from bookings import conflicts
+from writebehind import show_writer
+from routing import read_only
+from streaming import stream_template
+
+# forms are imported by the write handlers, see venues.py
+
+show_pages = Blueprint('shows', __name__)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@show_pages.route('/shows')
+@read_only
+@response_cache.cached(lambda: 'shows' if not request.args else None)
+def shows():
+  # displays list of shows at /shows, one page at a time
+  genre = request.args.get('genre')
+  try:
+    page = shows_page(after=request.args.get('after'), before=request.args.get('before'), genre=genre)
+  except ValueError:
+    abort(400)
+
+  return stream_template('pages/shows.html', shows=page["rows"], genre=genre,
+    next_cursor=page["next_cursor"], prev_cursor=page["prev_cursor"])
+
+
+@show_pages.route('/shows/create')
+def create_shows():
+  from forms import ShowForm
+  # renders form. do not touch.
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@show_pages.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  from forms import ShowForm, show_columns
+  # called to create new shows in the db, upon submitting new show listing form
+  # TODO: --done insert form data as a new Show record in the db, instead
+
+  show_form = ShowForm(request.form)
+  if show_form.validate():
+    values = show_columns(show_form)
+    # the exclusion constraints on ShowBooking have the last word, this says which side is taken
+    taken = conflicts(values)
+    if taken:
+      flash('Show was not listed: the ' + ' and the '.join(taken) + (' are' if len(taken) > 1 else ' is') + ' already booked at that time.')
+      return redirect(url_for("index"))
+    # written now, or queued with SHOW_WRITES = 'background' (see writebehind.py)
+    job_id = show_writer.submit(values)
+    message = show_writer.message(job_id)
+    if message:
+      flash(message)
+    else:
+      show_writer.remember(job_id)
+      flash('Show was submitted (job ' + job_id + ') and will be listed shortly.')
+  else:
+    print(show_form.errors)
+    flash('Show was not successfully listed.')
+  return redirect(url_for("index"))
@@ -0,0 +1,41 @@
+from flask import Response, current_app, get_flashed_messages, stream_with_context
+from instrumentation import timed_render
+
+
+#----------------------------------------------------------------------------#
+# Streaming templates.
+#
+# stream_template() renders with Jinja's generate(), so the first bytes leave
+# as soon as the top of the page is rendered; given a lazily iterated query
+# (see queries.stream_rows) only one batch of rows is held at a time. The
+# request context, and with it the database session, stays open until the
+# last chunk is sent.
+#----------------------------------------------------------------------------#
+
+# bytes of HTML gathered before a chunk is handed to the server
+CHUNK_SIZE = 16 * 1024
+
+
+def buffered(pieces, size=CHUNK_SIZE):
+  # Jinja yields every text node and expression on its own; join them into
+  # chunks of about `size` characters so each write to the socket is worth it
+  chunk, length = [], 0
+  for piece in pieces:
+    chunk.append(piece)
+    length += len(piece)
+    if length >= size:
+      yield "".join(chunk)
+      chunk, length = [], 0
+  if chunk:
+    yield "".join(chunk)
+
+
+def stream_template(template_name, **context):
+  # like render_template, but returns a streamed response
+  app = current_app._get_current_object()
+  app.update_template_context(context)
+  # the session cookie is saved before the body streams, so take the flashed
+  # messages out of it now; the template gets them from the request context
+  get_flashed_messages()
+  template = app.jinja_env.get_or_select_template(template_name)
+  return Response(stream_with_context(timed_render(buffered(template.generate(context)))), mimetype='text/html')
@@ -0,0 +1,89 @@
+import pytest
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app import create_app
+from config import TestingConfig
+from models import db
+
+
+#----------------------------------------------------------------------------#
+# Fixtures.
+#
+# The tests run against the Postgres database at TEST_DATABASE_URL (see
+# config.TestingConfig) and are skipped when it can't be reached. A database
+# migrated with `flask db upgrade` is used as it is; an empty one gets the
+# schema from the models. Tests that write use `database`, which empties the
+# tables afterwards; tests that only read can share `seeded`, bench.py's
+# generated data, across a module.
+#----------------------------------------------------------------------------#
+
+TABLES = ['ShowBooking', 'Show', 'ShowArchive', 'Venue', 'Artist', 'ShowCounterState']
+
+
+def reachable(url):
+  try:
+    sa.create_engine(url).connect().close()
+  except sa.exc.OperationalError:
+    return False
+  return True
+
+
+def empty_tables():
+  db.session.remove()
+  db.session.execute('TRUNCATE ' + ', '.join(f'"{table}"' for table in TABLES) + ' RESTART IDENTITY CASCADE')
+  db.session.commit()
+
+
+@pytest.fixture(scope='session')
+def app():
+  config = TestingConfig()
+  if not reachable(config.SQLALCHEMY_DATABASE_URI):
+    pytest.skip(f"no test database at {config.SQLALCHEMY_DATABASE_URI} (set TEST_DATABASE_URL)")
+  app = create_app(config)
+  with app.app_context():
+    if not db.engine.dialect.has_table(db.engine, 'Venue'):
+      db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+      db.session.commit()
+      db.create_all()
+    empty_tables()
+  return app
+
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
+
+
+@pytest.fixture
+def database(app):
+  # an app context on empty tables, emptied again afterwards
+  with app.app_context():
+    yield db
+    empty_tables()
+
+
+@pytest.fixture(scope='module')
+def seeded(app):
+  # 2000 venues, 2000 artists and 20000 shows from bench.seed(), analyzed; returns their ids
+  from bench import seed
+  with app.app_context():
+    ids = seed(2000, 2000, 20000)
+    db.session.execute('ANALYZE')
+    db.session.commit()
+  yield ids
+  with app.app_context():
+    empty_tables()
+
+
+@pytest.fixture
+def statements():
+  # [(statement, parameters)] of every statement the test runs
+  recorded = []
+
+  def record(conn, cursor, statement, parameters, context, executemany):
+    recorded.append((statement, parameters))
+
+  event.listen(Engine, 'before_cursor_execute', record)
+  yield recorded
+  event.remove(Engine, 'before_cursor_execute', record)
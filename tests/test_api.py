@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+import pytest
+from models import Venue, Artist, Show
+
+
+@pytest.fixture
+def show(database):
+  venue, artist = Venue(name='The Musical Hop'), Artist(name='Guns N Petals')
+  database.session.add_all([venue, artist])
+  database.session.commit()
+  database.session.execute(Show.__table__.insert().values(venue_id=venue.id, artist_id=artist.id,
+    start_time=datetime.utcnow() + timedelta(days=1)))
+  database.session.commit()
+  return venue, artist
+
+
+def get(client, path, **kwargs):
+  # the response, read and closed, as a server would
+  with client.get(path, **kwargs) as response:
+    response.get_data()
+  return response
+
+
+@pytest.mark.parametrize('path', ['/api/v1/venues', '/api/v1/artists', '/api/v1/shows'])
+def test_unchanged_collection_is_not_modified(client, show, path):
+  etag = get(client, path).headers['ETag']
+  response = get(client, path, headers={'If-None-Match': etag})
+  assert response.status_code == 304
+
+
+@pytest.mark.parametrize('model, path, changed', [
+  (Artist, '/api/v1/shows', True),
+  (Venue, '/api/v1/shows', True),
+  (Artist, '/api/v1/artists', True),
+  (Artist, '/api/v1/venues', False),
+])
+def test_rename_changes_the_collections_showing_it(client, show, database, model, path, changed):
+  etag = get(client, path).headers['ETag']
+  entity = show[0] if model is Venue else show[1]
+  database.session.query(model).filter(model.id == entity.id).update({'name': 'Renamed'})
+  database.session.commit()
+  response = get(client, path, headers={'If-None-Match': etag})
+  assert response.status_code == (200 if changed else 304)
+  if changed:
+    assert b'Renamed' in response.data
+
+
+def test_new_show_changes_the_shows_collection(client, show, database):
+  etag = get(client, '/api/v1/shows').headers['ETag']
+  venue, artist = show
+  database.session.execute(Show.__table__.insert().values(venue_id=venue.id, artist_id=artist.id,
+    start_time=datetime.utcnow() + timedelta(days=2)))
+  database.session.commit()
+  assert get(client, '/api/v1/shows', headers={'If-None-Match': etag}).status_code == 200
+
+
+
+def test_deleted_venue_changes_the_venues_collection(client, show, database):
+  empty = Venue(name='The Dueling Pianos Bar')
+  database.session.add(empty)
+  database.session.commit()
+  etag = get(client, '/api/v1/venues').headers['ETag']
+  database.session.delete(empty)
+  database.session.commit()
+  response = get(client, '/api/v1/venues', headers={'If-None-Match': etag})
+  assert response.status_code == 200
+  assert b'Dueling Pianos' not in response.data
@@ -0,0 +1,34 @@
+import random
+from datetime import datetime, timedelta
+from bookings import IntervalIndex
+
+
+def hours(start, end):
+  day = datetime(2030, 1, 1)
+  return day + timedelta(hours=start), day + timedelta(hours=end)
+
+
+def test_interval_index_finds_overlaps():
+  index = IntervalIndex()
+  index.add('venue', *hours(20, 22))
+  index.add('venue', *hours(10, 12))
+  assert index.overlaps('venue', *hours(21, 23))
+  assert index.overlaps('venue', *hours(9, 24))
+  assert index.overlaps('venue', *hours(11, 11.5))
+  # touching ends don't overlap
+  assert not index.overlaps('venue', *hours(22, 23))
+  assert not index.overlaps('venue', *hours(12, 20))
+  assert not index.overlaps('artist', *hours(20, 22))
+
+
+def test_interval_index_matches_a_scan():
+  rng = random.Random(7)
+  index, added = IntervalIndex(), []
+  for _ in range(2000):
+    start = rng.randrange(0, 5000)
+    interval = hours(start, start + rng.choice([1, 2, 3]))
+    expected = any(start < interval[1] and interval[0] < end for start, end in added)
+    assert index.overlaps('venue', *interval) == expected
+    if not expected:
+      index.add('venue', *interval)
+      added.append(interval)
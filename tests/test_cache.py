@@ -0,0 +1,35 @@
+import time
+import pytest
+from models import Venue
+
+
+@pytest.fixture
+def venue(database):
+  venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+  database.session.add(venue)
+  database.session.commit()
+  return venue
+
+
+def test_entity_page_is_public(client, venue):
+  response = client.get(f'/venues/{venue.id}')
+  assert response.cache_control.public
+  assert 'Set-Cookie' not in response.headers
+
+
+def test_entity_page_setting_the_session_cookie_is_private(client, venue):
+  # a job still pending and one given up on: the session is rewritten without the latter
+  with client.session_transaction() as session:
+    session['show_jobs'] = [['0' * 32, time.time()], ['1' * 32, time.time() - 3600]]
+  response = client.get(f'/venues/{venue.id}')
+  assert 'Set-Cookie' in response.headers
+  assert not response.cache_control.public
+  assert response.cache_control.private
+
+
+def test_pending_show_job_leaves_the_session_alone(client, venue):
+  with client.session_transaction() as session:
+    session['show_jobs'] = [['0' * 32, time.time()]]
+  response = client.get(f'/venues/{venue.id}')
+  assert 'Set-Cookie' not in response.headers
+  assert response.cache_control.public
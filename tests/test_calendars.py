@@ -0,0 +1,42 @@
+import pytest
+from models import Venue
+
+
+@pytest.fixture
+def venue(database):
+  venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+  database.session.add(venue)
+  database.session.commit()
+  return venue
+
+
+@pytest.mark.parametrize('query', [
+  'from=9999-12-31',
+  'from=9999-12-30',
+  'from=9999-12-25&to=9999-12-31',
+  'from=2026-13-01',
+  'from=2026-05-02&to=2026-05-01',
+])
+@pytest.mark.parametrize('path', ['/calendar', '/calendar.ics', '/venues/{id}/calendar', '/venues/{id}/calendar.ics'])
+def test_out_of_range_dates_are_bad_requests(client, venue, path, query):
+  assert client.get(path.format(id=venue.id) + '?' + query).status_code == 400
+
+
+def test_first_days_have_no_earlier_link(client, venue):
+  response = client.get(f'/venues/{venue.id}/calendar?from=0001-01-01')
+  assert response.status_code == 200
+  assert b'Earlier' not in response.data
+  assert b'Later' in response.data
+
+
+def test_last_days_have_no_later_link(client, venue):
+  response = client.get('/calendar?from=9999-12-20&to=9999-12-26')
+  assert response.status_code == 200
+  assert b'Earlier' in response.data
+  assert b'Later' not in response.data
+
+
+def test_ics_of_the_first_days(client, venue):
+  response = client.get('/calendar.ics?from=0001-01-01')
+  assert response.status_code == 200
+  assert response.data.startswith(b'BEGIN:VCALENDAR')
@@ -0,0 +1,15 @@
+import pytest
+from config import ProductionConfig, get_config
+
+
+def test_production_needs_a_secret_key(monkeypatch):
+  monkeypatch.setattr(ProductionConfig, 'SECRET_KEY', None)
+  with pytest.raises(RuntimeError, match='SECRET_KEY'):
+    get_config('production')
+
+  monkeypatch.setattr(ProductionConfig, 'SECRET_KEY', 'shared by every worker')
+  assert get_config('production').SECRET_KEY == 'shared by every worker'
+
+
+def test_development_makes_up_a_key():
+  assert get_config('development').SECRET_KEY
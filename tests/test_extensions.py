@@ -0,0 +1,37 @@
+import pytest
+from app import create_app
+from config import TestingConfig
+from models import Venue
+
+
+class OtherConfig(TestingConfig):
+  CACHE_BACKEND = 'lru'
+  SEARCH_BACKEND = 'memory'
+  SEARCH_RESULT_LIMIT = 1
+  SLOW_QUERY_THRESHOLD = 5
+
+
+@pytest.fixture
+def other(app):
+  return create_app(OtherConfig())
+
+
+def test_apps_keep_their_own_state(app, other):
+  assert app.extensions['response_cache'].backend is None
+  assert other.extensions['response_cache'].backend is not None
+  assert type(app.extensions['search']).__name__ == 'PostgresSearchBackend'
+  assert type(other.extensions['search']).__name__ == 'MemorySearchBackend'
+  assert app.extensions['instrumentation'].slow_query_threshold != 5
+  assert app.extensions['show_writer'] is not other.extensions['show_writer']
+
+
+def test_requests_count_in_their_own_app(app, other, database):
+  database.session.add_all([Venue(name='The Musical Hop'), Venue(name='The Dueling Pianos Bar')])
+  database.session.commit()
+  response = other.test_client().post('/venues/search', data={'search_term': 'the'})
+  # found both, listed SEARCH_RESULT_LIMIT
+  assert b': 2</h3>' in response.data
+  assert response.data.count(b'<h5>') == 1
+  assert other.extensions['instrumentation'].totals['venues.search_venues'][4] == 1
+  assert app.extensions['instrumentation'].totals['venues.search_venues'][4] == 0
+  assert app.test_client().post('/venues/search', data={'search_term': 'the'}).data.count(b'<h5>') == 2
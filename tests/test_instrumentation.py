@@ -0,0 +1,69 @@
+import re
+import pytest
+from models import Venue, Artist
+
+
+@pytest.fixture
+def listed(database):
+  database.session.add_all([
+    Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz']),
+    Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock n Roll']),
+  ])
+  database.session.commit()
+  return database
+
+
+def metric(client, name, endpoint):
+  text = client.get('/_metrics').data.decode()
+  found = re.search(rf'^{name}{{endpoint="{re.escape(endpoint)}"}} (\S+)$', text, re.M)
+  return float(found.group(1)) if found else 0.0
+
+
+@pytest.mark.parametrize('path, endpoint', [
+  ('/venues', 'venues.venues'),
+  ('/artists', 'artists.artists'),
+  ('/shows', 'shows.shows'),
+])
+def test_streamed_page_is_counted_once_sent(client, listed, path, endpoint):
+  statements = metric(client, 'fyyur_db_statements_total', endpoint)
+  render_seconds = metric(client, 'fyyur_render_seconds_total', endpoint)
+  with client.get(path) as response:
+    assert response.is_streamed
+    # the numbers aren't known when the headers go out
+    assert 'Server-Timing' not in response.headers
+    assert b'</html>' in response.get_data()
+  assert metric(client, 'fyyur_db_statements_total', endpoint) > statements
+  assert metric(client, 'fyyur_render_seconds_total', endpoint) > render_seconds
+
+
+def test_rendered_page_has_server_timing(client, listed):
+  venue_id = listed.session.query(Venue.id).scalar()
+  response = client.get(f'/venues/{venue_id}')
+  timing = response.headers['Server-Timing']
+  count = int(re.search(r'"(\d+) statements"', timing).group(1))
+  assert count > 0
+
+
+def test_statements_counted_once_with_a_second_app(app):
+  from flask import g
+  from app import create_app
+  from config import TestingConfig
+  from instrumentation import instrumentation
+  from models import db
+  create_app(TestingConfig())
+  with app.test_request_context('/'):
+    instrumentation.before_request()
+    db.session.execute('SELECT 1')
+    assert g.sql_count == 1
+    db.session.remove()
+
+
+def test_slow_statement_log_is_bounded(app, monkeypatch, caplog):
+  from models import db
+  monkeypatch.setattr(app.extensions['instrumentation'], 'slow_query_threshold', 0)
+  values = {f'p{index}': 'x' * 1000 for index in range(200)}
+  with app.app_context():
+    db.session.execute('SELECT ' + ', '.join(f':p{index}' for index in range(200)), values)
+    db.session.remove()
+  message, = [record.getMessage() for record in caplog.records if 'slow statement' in record.getMessage()]
+  assert len(message) < 3000
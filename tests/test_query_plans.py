@@ -0,0 +1,76 @@
+import re
+import pytest
+from models import db, Venue, Artist
+
+
+#----------------------------------------------------------------------------#
+# Every statement these endpoints run is EXPLAINed on the seeded data; none
+# may read a whole Show (partition), Venue or Artist table. /venues, /artists
+# and the API collections list every row, so they aren't here.
+#----------------------------------------------------------------------------#
+
+SEQUENTIAL_SCAN = re.compile(r'Seq Scan on "?(Show|Venue|Artist)\b')
+
+
+def plans(statements):
+  # the EXPLAIN output of each SELECT, run the way SQLAlchemy ran it
+  found = []
+  connection = db.engine.raw_connection()
+  try:
+    cursor = connection.cursor()
+    for statement, parameters in statements:
+      if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        cursor.execute('EXPLAIN ' + statement, parameters)
+        found.append((statement, '\n'.join(row for row, in cursor.fetchall())))
+  finally:
+    connection.close()
+  return found
+
+
+def assert_indexed(app, statements):
+  with app.app_context():
+    explained = plans(statements)
+  assert explained
+  for statement, plan in explained:
+    assert not SEQUENTIAL_SCAN.search(plan), f"{statement}\n{plan}"
+
+
+@pytest.fixture(scope='module')
+def entities(app, seeded):
+  with app.app_context():
+    venue = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state).filter(Venue.id == seeded[Venue][5]).one()
+    artist = db.session.query(Artist.id, Artist.name).filter(Artist.id == seeded[Artist][5]).one()
+  return venue, artist
+
+
+@pytest.mark.parametrize('path', [
+  '/',
+  '/venues/{venue.id}',
+  '/artists/{artist.id}',
+  '/shows',
+  '/venues/{venue.id}/calendar',
+  '/artists/{artist.id}/calendar',
+  '/calendar?city={venue.city}&state={venue.state}',
+  '/api/v1/venues/{venue.id}',
+  '/api/v1/artists/{artist.id}',
+])
+def test_pages_use_indexes(app, client, entities, statements, path):
+  venue, artist = entities
+  with client.get(path.format(venue=venue, artist=artist)) as response:
+    assert response.status_code == 200
+    response.get_data()
+  assert_indexed(app, statements)
+
+
+@pytest.mark.parametrize('path, model', [('/venues/search', Venue), ('/artists/search', Artist)])
+def test_search_uses_indexes(app, client, entities, statements, path, model):
+  with app.app_context():
+    trigram_index = db.session.execute("SELECT 1 FROM pg_indexes WHERE indexname = :name",
+      {'name': f'ix_{model.__tablename__}_name_trgm'}).scalar()
+  if not trigram_index:
+    pytest.skip(f"no trigram index on {model.__tablename__}.name (pg_trgm without gin_trgm_ops)")
+  venue, artist = entities
+  # a name matches a handful of rows; a common word would match half the table and rightly scan it
+  response = client.post(path, data={'search_term': (venue if model is Venue else artist).name})
+  assert response.status_code == 200
+  assert_indexed(app, statements)
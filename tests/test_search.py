@@ -0,0 +1,87 @@
+import pytest
+from models import Venue, Artist
+
+
+@pytest.fixture
+def listed(database):
+  database.session.add_all([
+    Venue(name='The Musical Hop', city='San Francisco', state='CA'),
+    Venue(name='Park Square Live Music & Coffee', city='San Francisco', state='CA'),
+    Artist(name='Guns N Petals', city='San Francisco', state='CA'),
+    Artist(name='The Wild Sax Band', city='San Francisco', state='CA'),
+  ])
+  database.session.commit()
+  return database
+
+
+@pytest.mark.parametrize('path', ['/venues/search', '/artists/search'])
+@pytest.mark.parametrize('term', ['', '%', '  ?!  '])
+def test_search_without_terms_lists_everything(client, listed, path, term):
+  response = client.post(path, data={'search_term': term})
+  assert response.status_code == 200
+  assert b': 2</h3>' in response.data
+
+
+def test_search_ranks_matches(client, listed):
+  response = client.post('/venues/search', data={'search_term': 'hop'})
+  assert response.status_code == 200
+  assert b': 1</h3>' in response.data
+  assert b'The Musical Hop' in response.data
+
+
+def names(results):
+  return sorted(result.name for result in results["data"])
+
+
+def test_memory_backend_from_rows():
+  # no database involved
+  from search import MemorySearchBackend
+  backend = MemorySearchBackend(
+    venues=[(1, 'The Musical Hop', 'San Francisco', 'CA', 2), (2, 'Park Square Live Music & Coffee', 'San Francisco', 'CA', 0)],
+    artists=[(1, 'Guns N Petals', 'San Francisco', 'CA', 1)])
+  assert names(backend.search(Venue, 'hop', 10)) == ['The Musical Hop']
+  assert names(backend.search(Venue, 'mus', 10)) == ['Park Square Live Music & Coffee', 'The Musical Hop']
+  assert backend.search(Venue, 'san francisco', 1)["count"] == 2
+  result, = backend.search(Artist, 'petals', 10)["data"]
+  assert result.num_upcoming_shows == 1
+  assert backend.search(Artist, 'xyz', 10) == {"count": 0, "data": []}
+
+
+def test_memory_backend_loads_and_follows_writes(listed):
+  from datetime import datetime, timedelta
+  from models import Show
+  from counters import record_shows, roll_forward
+  from search import MemorySearchBackend
+  backend = MemorySearchBackend()
+  # rows written before it existed
+  assert names(backend.search(Venue, 'hop', 10)) == ['The Musical Hop']
+
+  # a Core insert, as flask import and the bench seed do
+  listed.session.execute(Venue.__table__.insert().values([{'name': 'Hopscotch Hall', 'city': 'Austin', 'state': 'TX'}]))
+  listed.session.commit()
+  assert names(backend.search(Venue, 'hop', 10)) == ['Hopscotch Hall', 'The Musical Hop']
+
+  # a show written and counted, as the write-behind does
+  venue_id = listed.session.query(Venue.id).filter(Venue.name == 'The Musical Hop').scalar()
+  artist_id = listed.session.query(Artist.id).filter(Artist.name == 'Guns N Petals').scalar()
+  show = dict(venue_id=venue_id, artist_id=artist_id, start_time=datetime.utcnow() + timedelta(days=1))
+  listed.session.execute(Show.__table__.insert().values(show))
+  record_shows([show])
+  listed.session.commit()
+  result, = backend.search(Artist, 'petals', 10)["data"]
+  assert result.num_upcoming_shows == 1
+
+  # the show started, and the counters were rolled forward past it
+  roll_forward(now=datetime.utcnow() + timedelta(days=2))
+  result, = backend.search(Artist, 'petals', 10)["data"]
+  assert result.num_upcoming_shows == 0
+
+
+@pytest.mark.parametrize('term', ['', 'hop', 'music', 'san francisco', 'the', 'petals', 'sax band', 'xyz'])
+def test_memory_backend_matches_postgres(listed, term):
+  from search import MemorySearchBackend, PostgresSearchBackend
+  for model in (Venue, Artist):
+    expected = PostgresSearchBackend().search(model, term, 10)
+    found = MemorySearchBackend().search(model, term, 10)
+    assert found["count"] == expected["count"]
+    assert sorted(found["data"]) == sorted(expected["data"])
@@ -0,0 +1,54 @@
+import pytest
+
+
+#----------------------------------------------------------------------------#
+# How many SQL statements a page runs, on the seeded data: a fixed number,
+# however many rows it shows.
+#----------------------------------------------------------------------------#
+
+def selects(statements):
+  return [statement for statement, _ in statements if statement.lstrip().upper().startswith(('SELECT', 'WITH'))]
+
+
+def get(client, path):
+  with client.get(path) as response:
+    assert response.status_code == 200
+    return response.get_data()
+
+
+@pytest.mark.parametrize('path', ['/venues', '/venues?genre=Jazz'])
+def test_venue_listing_is_one_statement(client, seeded, statements, path):
+  body = get(client, path)
+  assert body.count(b'<h3>') > 1
+  assert len(selects(statements)) == 1
+
+
+@pytest.fixture(scope='module')
+def busiest(app, seeded):
+  # the venue and the artist with the most shows: more than a page section holds
+  from models import db, Show
+  with app.app_context():
+    return {
+      'venues': db.session.query(Show.venue_id).group_by(Show.venue_id).order_by(db.func.count().desc()).limit(1).scalar(),
+      'artists': db.session.query(Show.artist_id).group_by(Show.artist_id).order_by(db.func.count().desc()).limit(1).scalar(),
+    }
+
+
+@pytest.mark.parametrize('collection', ['venues', 'artists'])
+def test_detail_page_is_three_statements(client, busiest, statements, collection):
+  from queries import DETAIL_SHOWS_LIMIT
+  body = get(client, f'/{collection}/{busiest[collection]}')
+  # the version lookup for the ETag, the entity, then its shows in one query
+  assert len(selects(statements)) == 3
+  assert 0 < body.count(b'tile-show') <= 2 * DETAIL_SHOWS_LIMIT
+
+
+@pytest.mark.parametrize('collection', ['venues', 'artists'])
+def test_unchanged_detail_page_is_one_statement(client, busiest, statements, collection):
+  path = f'/{collection}/{busiest[collection]}'
+  with client.get(path) as response:
+    etag = response.headers['ETag']
+  statements.clear()
+  with client.get(path, headers={'If-None-Match': etag}) as response:
+    assert response.status_code == 304
+  assert len(selects(statements)) == 1
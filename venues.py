@@ -0,0 +1,153 @@
+import sys
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort
+from models import db, Venue
+from queries import venue_areas, venue_detail
+from search import search
+from counters import forget_shows_of
+from cache import response_cache, conditional, touch_counterparts, venue_key, venue_page_keys
+from routing import read_only
+from streaming import stream_template
+
+# forms (and WTForms with them) are imported by the handlers that need them,
+# so workers that only serve pages never load them
+
+venue_pages = Blueprint('venues', __name__)
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@venue_pages.route('/venues')
+@read_only
+@response_cache.cached(lambda: 'venues' if not request.args else None)
+def venues():
+  # TODO: --done replace with real venues data.
+  #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
+
+  # areas, venues and upcoming show counts come back from a single query
+  genre = request.args.get('genre')
+  venue_data = venue_areas(genre=genre)
+  return stream_template('pages/venues.html', areas=venue_data, genre=genre)
+
+#  Venues search
+#  ----------------------------------------------------------------
+@venue_pages.route('/venues/search', methods=['POST'])
+def search_venues():
+  # TODO: implement search on venues with partial string search. Ensure it is case-insensitive.
+  # seach for Hop should return "The Musical Hop".
+  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+
+  search_query = request.form.get("search_term", "")
+  # ranked, limited matches with their upcoming show counts, in one query
+  search_results = search.venues(search_query)
+
+  return render_template('pages/search_venues.html', results=search_results, search_term=search_query)
+
+#  Venues by id
+#  ----------------------------------------------------------------
+@venue_pages.route('/venues/<int:venue_id>')
+@read_only
+@conditional(Venue)
+@response_cache.cached(venue_key)
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  venue_data = venue_detail(venue_id)
+  if venue_data is None:
+    abort(404)
+
+  return render_template('pages/show_venue.html', venue=venue_data)
+
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@venue_pages.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@venue_pages.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  from forms import VenueForm, venue_columns
+  # TODO: insert form data as a new Venue record in the db, instead
+  venue_form = VenueForm(request.form)
+  if venue_form.validate():
+    try:
+      new_venue_record = Venue(**venue_columns(venue_form))
+      db.session.add(new_venue_record)
+      db.session.commit()
+      response_cache.invalidate('venues', 'index')
+      flash('Venue ' + request.form['name'] + ' was successfully listed!')
+
+    except Exception:
+      db.session.rollback()
+      print(sys.exc_info())
+      flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+  else:
+    print("\n\n", venue_form.errors)
+    # TODO: --done on unsuccessful db insert, flash an error instead.
+    flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+  return redirect(url_for("index"))
+
+#  Update Venue
+#  ----------------------------------------------------------------
+
+@venue_pages.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  from forms import VenueForm
+  form = VenueForm()
+  venue = Venue.query.get(venue_id)
+  form.genres.data = venue.genres
+
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+#  Update Venue
+#  ----------------------------------------------------------------
+@venue_pages.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  from forms import VenueForm, venue_columns
+  venue_form = VenueForm(request.form)
+  if venue_form.validate():
+      try:
+        venue_to_update = Venue.query.get(venue_id)
+
+        for column, value in venue_columns(venue_form).items():
+          setattr(venue_to_update, column, value)
+        db.session.add(venue_to_update)
+        touch_counterparts(venue_to_update)
+        db.session.commit()
+        response_cache.invalidate(*venue_page_keys(venue_id))
+        flash("Venue " + venue_form.name.data + " edited successfully")
+
+      except Exception:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash("Venue was not edited successfully.")
+  else:
+    print("\n\n", venue_form.errors)
+    flash("Venue was not edited successfully.")
+  return redirect(url_for('venues.show_venue', venue_id=venue_id))
+
+
+
+@venue_pages.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # TODO: --done Complete this endpoint for taking a venue_id, and using
+  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  try:
+    venue = Venue.query.get(venue_id)
+    stale_keys = venue_page_keys(venue.id)
+    forget_shows_of(Venue, venue.id)
+    db.session.delete(venue)
+    db.session.commit()
+    response_cache.invalidate(*stale_keys)
+    flash("Venue " + venue.name + " was deleted successfully!")
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    flash("Venue was not deleted successfully.")
+  return redirect(url_for("index"))
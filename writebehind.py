@@ -0,0 +1,300 @@
+import atexit
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from flask import current_app, flash, request, session
+from models import db, Show
+from counters import record_shows
+from cache import response_cache, venue_key, artist_key
+
+
+#----------------------------------------------------------------------------#
+# Show write-behind.
+#
+# With SHOW_WRITES = 'background' a validated show goes onto an in-process
+# queue and the form post returns straight away with a job id. A worker
+# thread takes whatever has queued up (waiting up to SHOW_FLUSH_WAIT for more,
+# at most SHOW_BATCH_SIZE shows) and inserts it in one transaction, so a
+# burst of submissions pays for one commit per batch instead of one per show.
+# The outcome is flashed to the submitter on their next request, and
+# /api/v1/shows/jobs/<id> reports it too.
+#
+# SHOW_WRITES = 'sync', the default, runs the same insert inline, one show per
+# transaction; tests use it. So does a submission that finds the queue full.
+#
+# Jobs belong to the process that took them: a normal exit drains the queue,
+# but shows still queued when a process is killed are lost, and with several
+# worker processes an outcome is only reported by requests that reach the
+# process that wrote it.
+#
+# Every app has its own ShowWriter (queue, worker, jobs and stats), in
+# app.extensions['show_writer']; show_writer hands calls to the current app's.
+#----------------------------------------------------------------------------#
+
+QUEUED, DONE, FAILED = 'queued', 'done', 'failed'
+
+# finished jobs remembered for status lookups
+MAX_JOBS = 10000
+# a submission no process has reported on after this many seconds is dropped from the session
+REPORT_SECONDS = 600
+
+ASSET_ENDPOINTS = ('static', 'assets.bundle')
+
+SUCCESS_MESSAGE = 'Show was successfully listed!'
+FAILURE_MESSAGE = 'Show was not successfully listed.'
+# a show that got past bookings.conflicts() but lost a race for its slot
+CONFLICT_MESSAGE = 'Show was not listed: the venue or the artist was booked at that time meanwhile.'
+
+
+def error_message():
+  return str(sys.exc_info()[1]).splitlines()[0]
+
+
+class ShowWriter:
+  # one app's writer
+
+  def __init__(self, app=None):
+    self.lock = threading.Lock()
+    # job id -> (state, error)
+    self.jobs = OrderedDict()
+    self.queue = None
+    self.worker = None
+    self.pid = None
+    self.stopping = False
+    self.stats = {
+      'flushes': 0, 'flush_seconds': 0.0, 'flush_seconds_max': 0.0,
+      'written': 0, 'failed': 0, 'wait_seconds': 0.0, 'overflows': 0,
+    }
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.app = app
+    self.background = app.config.get('SHOW_WRITES', 'sync') == 'background'
+    self.batch_size = app.config.get('SHOW_BATCH_SIZE', 200)
+    self.flush_wait = app.config.get('SHOW_FLUSH_WAIT', 0.05)
+    self.queue_size = app.config.get('SHOW_QUEUE_SIZE', 10000)
+    app.before_request(self.report_jobs)
+    writers.add(self)
+
+  #  Submitting
+  #  ----------------------------------------------------------------
+
+  def submit(self, values):
+    # queues (or, in sync mode, writes) a show given as a dict of Show columns; returns its job id
+    job_id = uuid.uuid4().hex
+    item = (job_id, values, time.perf_counter())
+    with self.lock:
+      self.set_state(job_id, QUEUED)
+    if self.background and not self.stopping:
+      try:
+        self.started().put_nowait(item)
+        return job_id
+      except queue.Full:
+        with self.lock:
+          self.stats['overflows'] += 1
+    self.flush([item])
+    return job_id
+
+  def started(self):
+    # the queue, with a worker thread running in this process (again, after a fork)
+    with self.lock:
+      if self.pid != os.getpid():
+        self.pid = os.getpid()
+        self.queue = queue.Queue(self.queue_size)
+        self.worker = threading.Thread(target=self.run, name='show-writer', daemon=True)
+        self.worker.start()
+      return self.queue
+
+  def stop(self, timeout=10):
+    # writes what is still queued; called at exit
+    self.stopping = True
+    if self.worker is not None and self.pid == os.getpid() and self.worker.is_alive():
+      self.queue.put(None)
+      self.worker.join(timeout)
+
+  #  Writing
+  #  ----------------------------------------------------------------
+
+  def run(self):
+    stop = False
+    while not stop:
+      item = self.queue.get()
+      if item is None:
+        break
+      batch = [item]
+      deadline = time.monotonic() + self.flush_wait
+      while len(batch) < self.batch_size:
+        try:
+          item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+          break
+        if item is None:
+          stop = True
+          break
+        batch.append(item)
+      with self.app.app_context():
+        try:
+          self.flush(batch)
+        except Exception:
+          # keep the worker alive whatever happens; the batch's jobs fail
+          self.app.logger.exception('show write-behind flush failed')
+          self.finish(batch, {job_id: error_message() for job_id, _, _ in batch}, 0.0)
+
+  def flush(self, batch):
+    # batch: [(job id, values, queued at)]; inserts it in one transaction and returns {job id: error}
+    started = time.perf_counter()
+    failures = {}
+    try:
+      self.insert([values for _, values, _ in batch])
+    except Exception:
+      db.session.rollback()
+      if len(batch) == 1:
+        failures[batch[0][0]] = error_message()
+      else:
+        # one bad show (a venue deleted meanwhile, say) fails the whole batch; write
+        # the shows one by one so only that one fails
+        for job_id, values, _ in batch:
+          try:
+            self.insert([values])
+          except Exception:
+            db.session.rollback()
+            failures[job_id] = error_message()
+    self.finish(batch, failures, time.perf_counter() - started)
+    return failures
+
+  def insert(self, shows):
+    db.session.execute(Show.__table__.insert().values(shows))
+    record_shows(shows)
+    db.session.commit()
+
+  def finish(self, batch, failures, elapsed):
+    written = [values for job_id, values, _ in batch if job_id not in failures]
+    finished = time.perf_counter()
+    with self.lock:
+      for job_id, _, _ in batch:
+        self.set_state(job_id, FAILED if job_id in failures else DONE, failures.get(job_id))
+      self.stats['flushes'] += 1
+      self.stats['flush_seconds'] += elapsed
+      self.stats['flush_seconds_max'] = max(self.stats['flush_seconds_max'], elapsed)
+      self.stats['written'] += len(written)
+      self.stats['failed'] += len(failures)
+      self.stats['wait_seconds'] += sum(finished - queued_at for _, _, queued_at in batch)
+    for job_id, error in failures.items():
+      self.app.logger.warning('show job %s failed: %s', job_id, error)
+    if written:
+      keys = {'venues', 'shows'}
+      keys.update(venue_key(values['venue_id']) for values in written)
+      keys.update(artist_key(values['artist_id']) for values in written)
+      response_cache.invalidate(*keys)
+
+  #  Jobs
+  #  ----------------------------------------------------------------
+
+  def set_state(self, job_id, state, error=None):
+    self.jobs[job_id] = (state, error)
+    self.jobs.move_to_end(job_id)
+    while len(self.jobs) > MAX_JOBS:
+      self.jobs.popitem(last=False)
+
+  def state(self, job_id):
+    # QUEUED, DONE, FAILED, or None for a job this process doesn't know
+    entry = self.jobs.get(job_id)
+    return entry[0] if entry is not None else None
+
+  def message(self, job_id):
+    # what to flash about a finished job; None while it is queued or if it is unknown
+    state, error = self.jobs.get(job_id, (None, None))
+    if state == DONE:
+      return SUCCESS_MESSAGE
+    if state == FAILED:
+      # the constraint names say it was a booking conflict
+      return CONFLICT_MESSAGE if error and 'ShowBooking_' in error else FAILURE_MESSAGE
+    return None
+
+  def remember(self, job_id):
+    # report the job's outcome to this client once it is written
+    session['show_jobs'] = session.get('show_jobs', []) + [[job_id, time.time()]]
+
+  def report_jobs(self):
+    # before each request: flash the outcome of the client's finished jobs. Asset requests
+    # leave the session alone, it would add Vary: Cookie to them.
+    if request.endpoint in ASSET_ENDPOINTS or self.app.session_cookie_name not in request.cookies:
+      return
+    jobs = session.get('show_jobs')
+    if not jobs:
+      return
+    pending = []
+    for job_id, submitted_at in jobs:
+      message = self.message(job_id)
+      if message:
+        flash(message)
+      elif self.state(job_id) == QUEUED or time.time() - submitted_at < REPORT_SECONDS:
+        pending.append([job_id, submitted_at])
+    # rewritten only when something changed: a Set-Cookie on every page while a job is
+    # queued would keep those pages out of shared caches for no reason
+    if not pending:
+      session.pop('show_jobs')
+    elif pending != jobs:
+      session['show_jobs'] = pending
+
+  #  Metrics
+  #  ----------------------------------------------------------------
+
+  def metrics(self):
+    # [(name, help, type, value)] for /_metrics
+    with self.lock:
+      stats = dict(self.stats)
+    depth = self.queue.qsize() if self.queue is not None and self.pid == os.getpid() else 0
+    return [
+      ('fyyur_show_queue_depth', 'Shows waiting in the write-behind queue.', 'gauge', depth),
+      ('fyyur_show_flushes_total', 'Show write transactions.', 'counter', stats['flushes']),
+      ('fyyur_show_flush_seconds_total', 'Time spent writing show batches.', 'counter', stats['flush_seconds']),
+      ('fyyur_show_flush_seconds_max', 'Slowest show batch write.', 'gauge', stats['flush_seconds_max']),
+      ('fyyur_show_writes_total', 'Shows written.', 'counter', stats['written']),
+      ('fyyur_show_write_failures_total', 'Shows that could not be written.', 'counter', stats['failed']),
+      ('fyyur_show_write_wait_seconds_total', 'Time from submission to commit, summed over shows.', 'counter', stats['wait_seconds']),
+      ('fyyur_show_queue_overflows_total', 'Shows written inline because the queue was full.', 'counter', stats['overflows']),
+    ]
+
+
+# every app's writer, drained at exit
+writers = weakref.WeakSet()
+
+@atexit.register
+def stop_writers():
+  for writer in list(writers):
+    writer.stop()
+
+
+class CurrentShowWriter:
+  # the current app's ShowWriter
+
+  def init_app(self, app):
+    app.extensions['show_writer'] = ShowWriter(app)
+
+  def writer(self):
+    return current_app.extensions['show_writer']
+
+  def submit(self, values):
+    return self.writer().submit(values)
+
+  def state(self, job_id):
+    return self.writer().state(job_id)
+
+  def message(self, job_id):
+    return self.writer().message(job_id)
+
+  def remember(self, job_id):
+    return self.writer().remember(job_id)
+
+  def metrics(self):
+    return self.writer().metrics()
+
+
+show_writer = CurrentShowWriter()